@@ -1,6 +1,7 @@
 """PE Tool Suite — Streamlit 앱 (PwC Brand Style)."""
 
 import sys
+import threading
 from pathlib import Path
 
 # 프로젝트 루트를 sys.path에 추가
@@ -8,6 +9,7 @@ ROOT = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(ROOT))
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
 
 from packages.agents.orchestrator import run as orchestrator_run
@@ -17,9 +19,10 @@ from packages.agents.accounting_impact_agent import run as accounting_impact_run
 from packages.agents.finance_cost_agent import run as finance_cost_run
 from packages.report.generator import generate_markdown, generate_html, save_markdown, save_html, save_docx
 from packages.report.legal_report import generate_legal_markdown
-from packages.rag.chat_engine import answer as rag_answer
-from packages.rag.vector_store import initialize_store as init_vector_store
-from packages.core.file_reader import extract_text as extract_file_text
+from packages.rag.chat_engine import start_warm_up as rag_start_warm_up, stream_answer as rag_stream_answer
+from packages.rag.vector_store import initialize_store as init_vector_store, last_sync as vector_store_last_sync
+from packages.core.file_reader import dart_sections, extract_many, extraction_stats
+from packages.core.table_reader import compact_text, extract_tables
 
 # ─── 페이지 설정 ───
 st.set_page_config(
@@ -662,6 +665,52 @@ if "report_generated" not in st.session_state:
     st.session_state.report_generated = False
 
 
+# ─── 업로드 파일 추출 ───
+def _extract_upload(f):
+    """파일 하나에서 프롬프트용 텍스트, 표, 사업보고서 목차를 뽑는다 (추출 워커 스레드에서 실행)."""
+    return compact_text(f), extract_tables(f), dart_sections(f)
+
+
+def _extract_uploads(files):
+    """업로드 파일을 동시에 추출하고 파일별 진행 상황을 표시한다.
+
+    Returns:
+        ([(텍스트, 표 목록, 목차)] 업로드 순서, {파일명: 소요 초})
+    """
+    status_placeholder = st.empty()
+    names = [f.name for f in files]
+    timings = {}
+
+    def on_progress(name, status, seconds):
+        if seconds is not None:
+            timings[name] = seconds
+        lines = []
+        for n in names:
+            if n in timings:
+                lines.append(f"✓ {n} — {timings[n]:.1f}초")
+            else:
+                lines.append(f"◉ {n} — 추출 중...")
+        status_placeholder.markdown("  \n".join(lines))
+
+    results = extract_many(files, _extract_upload, on_progress)
+    status_placeholder.empty()
+    return results, timings
+
+
+def _render_extraction_stats(files, timings):
+    """파일별 추출 시간과 PDF 머리말/꼬리말 제거·공백 정리로 줄어든 토큰 수를 표시한다."""
+    for f in files:
+        line = f"{f.name}: 추출 {timings.get(f.name, 0.0):.1f}초"
+        stats = extraction_stats(f)
+        if stats and stats["saved_tokens"] > 0:
+            line += (
+                f", 반복 머리말/꼬리말 {stats['removed_lines']:,}줄 제거, "
+                f"토큰 약 {stats['raw_tokens']:,} → {stats['tokens']:,} "
+                f"({stats['saved_tokens']:,} 절감)"
+            )
+        st.caption(line)
+
+
 # ═══════════════════════════════════════════
 # 랜딩 페이지 — 모듈 선택
 # ═══════════════════════════════════════════
@@ -726,6 +775,9 @@ if st.session_state.module is None:
             st.session_state.module = "accounting"
             st.rerun()
 
+    # 랜딩 페이지를 그린 뒤 벡터 스토어/임베딩/LLM 커넥션을 백그라운드에서 준비 (프로세스당 1회)
+    rag_start_warm_up()
+
 
 # ═══════════════════════════════════════════
 # 법무 모듈 — Legal Deep Dive
@@ -792,12 +844,17 @@ elif st.session_state.module == "legal":
             key="l_files",
         )
         l_uploaded = ""
+        l_sections = {}
         if l_files:
             parts = []
-            for f in l_files:
-                parts.append(f"[파일: {f.name}]\n{extract_file_text(f)}")
+            extracted, l_timings = _extract_uploads(l_files)
+            for f, (text, _, sections) in zip(l_files, extracted):
+                parts.append(f"[파일: {f.name}]\n{text}")
+                if sections:
+                    l_sections[f.name] = sections
             l_uploaded = "\n\n".join(parts)
             with st.expander(f"업로드 파일 미리보기 ({len(l_files)}개)"):
+                _render_extraction_stats(l_files, l_timings)
                 st.text(l_uploaded[:5000])
 
         st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
@@ -821,6 +878,7 @@ elif st.session_state.module == "legal":
                         "investment_purpose": l_purpose,
                         "memo": l_memo,
                         "uploaded_text": l_uploaded,
+                        "uploaded_sections": l_sections,
                     }
                     st.session_state.legal_deep_dive = l_deep_dive
                     st.session_state.legal_results = {}
@@ -1043,6 +1101,12 @@ elif st.session_state.module == "accounting":
         with st.spinner("질의회신 데이터베이스를 준비하고 있습니다..."):
             count = init_vector_store()
         st.session_state.acc_vectorstore_ready = True
+        sync = vector_store_last_sync()
+        if sync and (sync["added"] or sync["updated"] or sync["deleted"]):
+            st.caption(
+                f"질의회신 {count:,}건 동기화 — 추가 {sync['added']:,} · 변경 {sync['updated']:,} · "
+                f"삭제 {sync['deleted']:,} ({sync['seconds']:.1f}초)"
+            )
 
     current_messages = _get_current_messages()
     current_sources = _get_current_sources()
@@ -1099,10 +1163,13 @@ elif st.session_state.module == "accounting":
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("질의회신을 검색하고 답변을 생성하고 있습니다..."):
-                result = rag_answer(prompt, chat_data["messages"][:-1])
+            with st.spinner("질의회신을 검색하고 있습니다..."):
+                result = rag_stream_answer(prompt, chat_data["messages"][:-1])
 
-            st.markdown(result["answer"])
+            # 토큰이 도착하는 대로 답변을 렌더링
+            answer_text = st.write_stream(result["stream"])
+            if result.get("cached"):
+                st.caption("비슷한 질문에 대한 이전 답변을 재사용했습니다.")
 
             if result["sources"]:
                 with st.expander("참고 질의회신", expanded=False):
@@ -1113,7 +1180,7 @@ elif st.session_state.module == "accounting":
                         )
 
         msg_idx = len(chat_data["messages"])
-        chat_data["messages"].append({"role": "assistant", "content": result["answer"]})
+        chat_data["messages"].append({"role": "assistant", "content": answer_text})
         chat_data["sources"][str(msg_idx)] = result["sources"]
 
 
@@ -1250,12 +1317,19 @@ elif st.session_state.module == "investment":
         )
 
         uploaded_text = ""
+        uploaded_tables = []
+        uploaded_sections = {}
         if uploaded_files:
             parts = []
-            for f in uploaded_files:
-                parts.append(f"[파일: {f.name}]\n{extract_file_text(f)}")
+            extracted, timings = _extract_uploads(uploaded_files)
+            for f, (text, tables, sections) in zip(uploaded_files, extracted):
+                parts.append(f"[파일: {f.name}]\n{text}")
+                uploaded_tables.extend(tables)
+                if sections:
+                    uploaded_sections[f.name] = sections
             uploaded_text = "\n\n".join(parts)
             with st.expander(f"업로드된 파일 미리보기 ({len(uploaded_files)}개)"):
+                _render_extraction_stats(uploaded_files, timings)
                 st.text(uploaded_text[:5000])
 
         st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
@@ -1282,6 +1356,8 @@ elif st.session_state.module == "investment":
             if st.button("보고서 생성 →", use_container_width=True, type="primary"):
                 st.session_state.memo = memo
                 st.session_state.uploaded_text = uploaded_text
+                st.session_state.uploaded_tables = uploaded_tables
+                st.session_state.uploaded_sections = uploaded_sections
                 st.session_state.output_mode = output_mode
                 st.session_state.step = 4
                 st.session_state.report_generated = False
@@ -1327,6 +1403,8 @@ elif st.session_state.module == "investment":
                 "checklist_depth": st.session_state.get("checklist_depth", "Standard"),
                 "memo": st.session_state.get("memo", ""),
                 "uploaded_text": st.session_state.get("uploaded_text", ""),
+                "uploaded_tables": st.session_state.get("uploaded_tables", []),
+                "uploaded_sections": st.session_state.get("uploaded_sections", {}),
             }
             mode = st.session_state.get("output_mode", "Full DD Report")
 
@@ -1334,10 +1412,14 @@ elif st.session_state.module == "investment":
             progress_container = st.container()
             status_placeholder = progress_container.empty()
             progress_bar = progress_container.progress(0)
+            summary_placeholder = progress_container.empty()
 
             agent_statuses = {}
+            # 오케스트레이터가 워커 스레드에서 콜백을 호출하므로 스크립트 컨텍스트를 연결한다
+            script_ctx = get_script_run_ctx()
 
             def progress_callback(agent_name, status):
+                add_script_run_ctx(threading.current_thread(), script_ctx)
                 agent_statuses[agent_name] = status
                 lines = []
                 for k, v in agent_statuses.items():
@@ -1361,6 +1443,13 @@ elif st.session_state.module == "investment":
                 total = len(agent_statuses)
                 progress_bar.progress(done / max(total, 1))
 
+            summary_chunks = []
+
+            def stream_callback(delta):
+                # 종합 요약을 생성되는 대로 표시
+                summary_chunks.append(delta)
+                summary_placeholder.markdown("".join(summary_chunks) + " ▌")
+
             try:
                 st.markdown(
                     '<div style="font-size:0.9rem;color:#D04A02;font-weight:600;margin-bottom:8px;">'
@@ -1369,7 +1458,9 @@ elif st.session_state.module == "investment":
                 )
 
                 with st.spinner(""):
-                    result = orchestrator_run(context, mode, progress_callback)
+                    result = orchestrator_run(
+                        context, mode, progress_callback, stream_callback=stream_callback,
+                    )
 
                 progress_bar.progress(1.0)
                 status_placeholder.markdown(
@@ -1468,6 +1559,7 @@ elif st.session_state.module == "investment":
                 "risk_preference": st.session_state.get("risk_preference", ""),
                 "memo": st.session_state.get("memo", ""),
                 "uploaded_text": st.session_state.get("uploaded_text", ""),
+                "uploaded_sections": st.session_state.get("uploaded_sections", {}),
             }
             if "inv_legal_deep" not in st.session_state:
                 st.session_state.inv_legal_deep = None
@@ -1574,7 +1666,8 @@ elif st.session_state.module == "investment":
                     if st.session_state.inv_accounting_impact:
                         parts.append(f"[회계적 영향 분석]\n{st.session_state.inv_accounting_impact}")
 
-                    from packages.core.llm_client import generate_text
+                    from packages.core.llm_client import stream_text
+                    from packages.core.model_router import routed
                     final_system = (
                         "당신은 PE 투자회사의 시니어 파트너이자 최종 의사결정 자문역입니다.\n"
                         "아래 투자보고서, 법무 검토, 회계 검토 결과를 종합하여 최종 컨설팅 의견을 작성하세요.\n\n"
@@ -1601,8 +1694,8 @@ elif st.session_state.module == "investment":
                         "- 근거는 입력 텍스트 인용만 허용.\n"
                         "- Green/Yellow/Red 등급만 사용.\n"
                     )
-                    with st.spinner("종합 최종 의견 생성 중..."):
-                        opinion = generate_text(final_system, "\n\n".join(parts))
+                    with routed("final_opinion"):
+                        opinion = st.write_stream(stream_text(final_system, "\n\n".join(parts)))
                     st.session_state.inv_final_opinion = opinion
                     st.rerun()
             else:
@@ -0,0 +1,92 @@
+"""앱 콜드 스타트 import 시간 벤치마크.
+
+apps/web/app.py가 시작할 때 import하는 packages 모듈을 새 프로세스에서 import해
+걸린 시간을 재고, 예산을 넘거나 처음 쓸 때만 로드해야 하는 무거운 라이브러리
+(chromadb, openpyxl, PyPDF2, python-docx, jinja2, openai)가 로드되면 실패(exit 1)한다.
+
+사용법:
+    python benchmarks/import_time.py                # 기본 예산 IMPORT_BUDGET_SECONDS(0.5초)
+    python benchmarks/import_time.py --budget 0.3 --runs 7
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# app.py 상단에서 import하는 모듈 (streamlit 자체는 제외)
+APP_MODULES = [
+    "packages.agents.orchestrator",
+    "packages.agents.legal_agent",
+    "packages.agents.legal_deep_agent",
+    "packages.agents.accounting_impact_agent",
+    "packages.agents.finance_cost_agent",
+    "packages.report.generator",
+    "packages.report.legal_report",
+    "packages.rag.chat_engine",
+    "packages.rag.vector_store",
+    "packages.core.file_reader",
+    "packages.core.table_reader",
+]
+
+# 처음 사용할 때만 로드되어야 하는 라이브러리
+LAZY_MODULES = ["chromadb", "openpyxl", "PyPDF2", "docx", "jinja2", "openai"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once() -> dict:
+    code = _PROBE.format(modules=APP_MODULES, lazy=LAZY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_SECONDS", "0.5")))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # 첫 실행은 .pyc 생성 비용이 섞이므로 버린다
+    measure_once()
+    runs = [measure_once() for _ in range(args.runs)]
+    seconds = [r["seconds"] for r in runs]
+    median = statistics.median(seconds)
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+
+    print(f"app import: median {median:.3f}s, min {min(seconds):.3f}s, max {max(seconds):.3f}s "
+          f"({args.runs}회, 예산 {args.budget:.3f}s)")
+    failed = False
+    if loaded:
+        print(f"FAIL: 시작 시 로드되면 안 되는 모듈이 로드됨: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: import 시간이 예산을 초과함 ({median:.3f}s > {args.budget:.3f}s)")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""회계 질의회신 검색 벤치마크 — 검색 모드별 recall@k와 지연 시간.
+
+sample_qa.json의 각 질의회신을 애널리스트가 실제로 물을 법한 다른 표현(기준서 번호,
+영문 약어, 구어체)으로 바꾼 질의로 검색해, 정답 id가 상위 k개 안에 드는 비율과
+질의당 검색 시간을 vector / bm25 / hybrid 모드별로 비교한다.
+
+사용법:
+    python benchmarks/retrieval.py                       # 모든 모드
+    python benchmarks/retrieval.py --modes bm25,hybrid --k 1,3,5
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from packages.rag import vector_store  # noqa: E402
+
+# (질의, 정답 id)
+QUERIES = [
+    ("공사 진행 중에 예정원가가 늘어나면 누적효과로 조정하나요?", "QA-2024-001"),
+    ("SW 라이선스랑 유지보수를 묶어 팔 때 수행의무 구분", "QA-2024-002"),
+    ("K-IFRS 1116 리스변경 이용자 사용권자산 재측정", "QA-2024-003"),
+    ("서브리스 중간리스제공자 금융리스 운용리스 분류", "QA-2024-004"),
+    ("CB 발행하면 전환권은 자본인가 부채인가", "QA-2024-005"),
+    ("IFRS 9 ECL stage 2 신용위험 유의적 증가 30일 연체", "QA-2024-006"),
+    ("지분 과반 미만인데 사실상 지배력으로 연결해야 하나", "QA-2024-007"),
+    ("비지배주주 풋옵션 금융부채 인식", "QA-2024-008"),
+    ("원재료 가격이 다시 오르면 NRV 평가손실 환입 가능?", "QA-2024-009"),
+    ("공장 가동률이 낮을 때 고정제조간접원가 배부", "QA-2024-010"),
+    ("설비 내용연수 추정 변경은 전진적용인지 소급인지", "QA-2024-011"),
+    ("복구충당부채 할인율 바뀌면 자산 원가에 가감", "QA-2024-012"),
+    ("소송 패소 가능성이 높으면 충당부채 잡아야 하나", "QA-2024-013"),
+    ("제품 보증비 추정 기댓값 방식", "QA-2024-014"),
+    ("이연법인세자산 미래 과세소득 실현가능성", "QA-2024-015"),
+    ("연결 내부거래 미실현이익 제거할 때 이연법인세", "QA-2024-016"),
+    ("K-IFRS 1115 변동대가 추정치 제약 기댓값 가능성이 가장 높은 금액", "QA-2024-017"),
+    ("기타포괄손익 지정 주식 팔면 OCI 재순환 되나", "QA-2024-018"),
+    ("리스 기간 12개월 이하 소액자산 인식면제", "QA-2024-019"),
+    ("IAS 23 적격자산 차입원가 자본화 개시 중단", "QA-2024-020"),
+    ("관계기업 지분 추가 취득해서 지배력 획득, 기존 지분 공정가치 재측정", "QA-2025-001"),
+    ("지급보증 계약 최초 공정가치 후속측정 손실충당금", "QA-2025-002"),
+    ("구조조정 계획 발표 전에 충당부채 인식 가능한지", "QA-2025-003"),
+    ("IFRIC 23 세무당국 불확실한 법인세 처리", "QA-2025-004"),
+]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_mode(mode: str, ks: list[int]) -> dict:
+    depth = max(ks)
+    # 첫 질의에 섞이는 모델 로드/인덱스 생성 비용은 제외한다
+    vector_store.search(QUERIES[0][0], top_k=depth, mode=mode)
+    hits = {k: 0 for k in ks}
+    latencies = []
+    for query, expected in QUERIES:
+        start = time.perf_counter()
+        results = vector_store.search(query, top_k=depth, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        ids = [r["id"] for r in results]
+        for k in ks:
+            hits[k] += expected in ids[:k]
+    return {
+        "recall": {k: hits[k] / len(QUERIES) for k in ks},
+        "p50": statistics.median(latencies),
+        "p95": _percentile(latencies, 0.95),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(vector_store.SEARCH_MODES))
+    parser.add_argument("--k", default="1,3,5")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    ks = sorted({int(k) for k in args.k.split(",")})
+
+    vector_store.initialize_store()
+    header = f"{'mode':<8}" + "".join(f"{f'recall@{k}':>11}" for k in ks) + f"{'p50(ms)':>10}{'p95(ms)':>10}"
+    print(f"질의 {len(QUERIES)}개")
+    print(header)
+    for mode in modes:
+        try:
+            result = run_mode(mode, ks)
+        except Exception as e:
+            print(f"{mode:<8}실패: {e}")
+            continue
+        row = f"{mode:<8}" + "".join(f"{result['recall'][k]:>11.2f}" for k in ks)
+        print(row + f"{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@ Legal Deep Dive 결과 + Finance/Cost 결과를 연계하여
 """
 
 from packages.core.llm_client import generate_text
+from packages.agents.upload_context import upload_text_for
+from packages.core.model_router import routed
 
 SYSTEM_PROMPT = """당신은 PE 투자회사의 회계/법무 크로스 분석 전문가입니다.
 법무 실사 결과(Legal Deep Dive)와 재무 분석 결과를 연계하여,
@@ -75,9 +77,10 @@ def run(legal_result: str, finance_result: str, context: dict) -> str:
         parts.append("\n[재무 분석 결과] 없음 — 법무 이슈 기반으로만 회계 영향을 분석해주세요.")
 
     memo = context.get("memo", "")
-    uploaded = context.get("uploaded_text", "")
+    uploaded = upload_text_for(context, "accounting_impact")
     combined = (memo + "\n" + uploaded).strip()
     if combined:
         parts.append(f"\n[추가 입력 텍스트]\n{combined}")
 
-    return generate_text(SYSTEM_PROMPT, "\n".join(parts))
+    with routed("accounting_impact"):
+        return generate_text(SYSTEM_PROMPT, "\n".join(parts))
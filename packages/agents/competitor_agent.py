@@ -3,7 +3,10 @@
 대상 기업의 경쟁 환경, 주요 경쟁사 프로파일링, 포지셔닝을 분석한다.
 """
 
-from packages.core.llm_client import generate_text
+import asyncio
+
+from packages.core.llm_client import agenerate_text, generate_text
+from packages.agents.upload_context import upload_text_for
 
 SYSTEM_PROMPT = """\
 당신은 PE 투자회사의 경쟁사 분석 전문가입니다.
@@ -74,6 +77,12 @@ def run(context: dict) -> str:
     return generate_text(SYSTEM_PROMPT, user_prompt)
 
 
+async def arun(context: dict) -> str:
+    """run의 asyncio 버전. 프롬프트 구성(digest 추출 등 동기 LLM 호출 포함)은 스레드에서 한다."""
+    user_prompt = await asyncio.to_thread(_build_prompt, context)
+    return await agenerate_text(SYSTEM_PROMPT, user_prompt)
+
+
 def _build_prompt(ctx: dict) -> str:
     parts = [
         f"회사명: {ctx.get('company_name', '미정')}",
@@ -85,6 +94,7 @@ def _build_prompt(ctx: dict) -> str:
     ]
     if ctx.get("memo"):
         parts.append(f"\n자유 메모:\n{ctx['memo']}")
-    if ctx.get("uploaded_text"):
-        parts.append(f"\n업로드 자료:\n{ctx['uploaded_text']}")
+    uploaded = upload_text_for(ctx, "competitor")
+    if uploaded:
+        parts.append(f"\n업로드 자료:\n{uploaded}")
     return "\n".join(parts)
@@ -1,6 +1,9 @@
 """ExitStrategy Agent — 엑싯 전략 분석."""
 
-from packages.core.llm_client import generate_text
+import asyncio
+
+from packages.core.llm_client import agenerate_text, generate_text
+from packages.agents.upload_context import upload_text_for
 
 SYSTEM_PROMPT = """\
 당신은 PE 투자회사의 시니어 엑싯 전략 전문가입니다.
@@ -46,6 +49,12 @@ def run(context: dict) -> str:
     return generate_text(SYSTEM_PROMPT, user_prompt)
 
 
+async def arun(context: dict) -> str:
+    """run의 asyncio 버전. 프롬프트 구성(digest 추출 등 동기 LLM 호출 포함)은 스레드에서 한다."""
+    user_prompt = await asyncio.to_thread(_build_prompt, context)
+    return await agenerate_text(SYSTEM_PROMPT, user_prompt)
+
+
 def _build_prompt(ctx: dict) -> str:
     parts = [
         f"회사명: {ctx.get('company_name', '미정')}",
@@ -59,6 +68,7 @@ def _build_prompt(ctx: dict) -> str:
     ]
     if ctx.get("memo"):
         parts.append(f"\n자유 메모:\n{ctx['memo']}")
-    if ctx.get("uploaded_text"):
-        parts.append(f"\n업로드 자료:\n{ctx['uploaded_text']}")
+    uploaded = upload_text_for(ctx, "exit_strategy")
+    if uploaded:
+        parts.append(f"\n업로드 자료:\n{uploaded}")
     return "\n".join(parts)
@@ -1,6 +1,10 @@
 """FinanceCost Agent — 재무/비용 분석 및 QoE 보충."""
 
-from packages.core.llm_client import generate_text
+import asyncio
+
+from packages.core.financial_metrics import compute_metrics
+from packages.core.llm_client import agenerate_text, generate_text
+from packages.agents.upload_context import upload_text_for
 
 SYSTEM_PROMPT = """\
 당신은 PE 투자회사의 시니어 재무 애널리스트입니다.
@@ -9,6 +13,7 @@ SYSTEM_PROMPT = """\
 - 투자 판단 과장 금지. 근거와 확인 필요 사항을 분리 표기.
 - 근거가 있으면 입력 텍스트에서 인용(quote). 근거 없으면 "자료 필요" 표기.
 - 평가는 Green/Yellow/Red 등급만 사용.
+- "계산된 재무 지표"가 주어지면 그 숫자를 그대로 인용하고 다시 계산하지 말 것.
 - 한국어로 작성.
 
 출력 형식 (마크다운):
@@ -36,6 +41,12 @@ def run(context: dict) -> str:
     return generate_text(SYSTEM_PROMPT, user_prompt)
 
 
+async def arun(context: dict) -> str:
+    """run의 asyncio 버전. 프롬프트 구성(digest 추출 등 동기 LLM 호출 포함)은 스레드에서 한다."""
+    user_prompt = await asyncio.to_thread(_build_prompt, context)
+    return await agenerate_text(SYSTEM_PROMPT, user_prompt)
+
+
 def _build_prompt(ctx: dict) -> str:
     parts = [
         f"회사명: {ctx.get('company_name', '미정')}",
@@ -47,6 +58,10 @@ def _build_prompt(ctx: dict) -> str:
     ]
     if ctx.get("memo"):
         parts.append(f"\n자유 메모:\n{ctx['memo']}")
-    if ctx.get("uploaded_text"):
-        parts.append(f"\n업로드 자료:\n{ctx['uploaded_text']}")
+    metrics = compute_metrics(ctx.get("uploaded_tables") or [])
+    if metrics is not None:
+        parts.append(f"\n계산된 재무 지표 (업로드 재무제표 표에서 산출):\n{metrics.to_markdown()}")
+    uploaded = upload_text_for(ctx, "finance_cost", include_tables=metrics is None)
+    if uploaded:
+        parts.append(f"\n업로드 자료:\n{uploaded}")
     return "\n".join(parts)
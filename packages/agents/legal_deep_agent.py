@@ -7,6 +7,8 @@
 """
 
 from packages.core.llm_client import generate_text
+from packages.agents.upload_context import upload_text_for
+from packages.core.model_router import routed
 
 
 # ═══════════════════════════════════════════
@@ -53,8 +55,9 @@ DEAL_KILLER_SYSTEM = """당신은 PE 투자회사의 시니어 법무 전문가
 
 def run_deal_killer(context: dict) -> str:
     """Deal Killer 탐지 분석."""
-    prompt = _build_prompt(context, "Deal Killer 탐지")
-    return generate_text(DEAL_KILLER_SYSTEM, prompt)
+    prompt = _build_prompt(context, "Deal Killer 탐지", "deal_killer")
+    with routed("deal_killer"):
+        return generate_text(DEAL_KILLER_SYSTEM, prompt)
 
 
 # ═══════════════════════════════════════════
@@ -90,8 +93,9 @@ COC_MAP_SYSTEM = """당신은 PE 투자회사의 시니어 법무 전문가입
 
 def run_coc_map(context: dict) -> str:
     """Change of Control / Assignment Map 분석."""
-    prompt = _build_prompt(context, "Change of Control Map")
-    return generate_text(COC_MAP_SYSTEM, prompt)
+    prompt = _build_prompt(context, "Change of Control Map", "coc_map")
+    with routed("coc_map"):
+        return generate_text(COC_MAP_SYSTEM, prompt)
 
 
 # ═══════════════════════════════════════════
@@ -131,15 +135,16 @@ INDEMNITY_SYSTEM = """당신은 PE 투자회사의 시니어 법무 전문가입
 
 def run_indemnity(context: dict) -> str:
     """Indemnity Summary 분석."""
-    prompt = _build_prompt(context, "Indemnity Summary")
-    return generate_text(INDEMNITY_SYSTEM, prompt)
+    prompt = _build_prompt(context, "Indemnity Summary", "indemnity")
+    with routed("indemnity"):
+        return generate_text(INDEMNITY_SYSTEM, prompt)
 
 
 # ═══════════════════════════════════════════
 # 공통 프롬프트 빌더
 # ═══════════════════════════════════════════
 
-def _build_prompt(context: dict, analysis_type: str) -> str:
+def _build_prompt(context: dict, analysis_type: str, agent_key: str) -> str:
     """컨텍스트에서 사용자 프롬프트를 구성한다."""
     parts = [f"[분석 유형] {analysis_type}"]
     parts.append(f"[회사명] {context.get('company_name', '미정')}")
@@ -151,7 +156,7 @@ def _build_prompt(context: dict, analysis_type: str) -> str:
         parts.append(f"[리스크 선호] {context['risk_preference']}")
 
     memo = context.get("memo", "")
-    uploaded = context.get("uploaded_text", "")
+    uploaded = upload_text_for(context, agent_key)
     combined = (memo + "\n" + uploaded).strip()
 
     if combined:
@@ -1,6 +1,14 @@
 """Orchestrator — 보고서 모드에 따라 에이전트를 조율한다."""
+from __future__ import annotations
 
-from packages.core.llm_client import generate_text
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from packages.core.llm_client import agenerate_text, generate_text, stream_text
+from packages.core.model_router import routed
+from packages.agents import upload_context
 from packages.agents import (
     dd_agent,
     consulting_agent,
@@ -28,6 +36,9 @@ AGENT_MAP = {
     "exit_strategy": ("ExitStrategy Agent (엑싯)", exit_strategy_agent),
 }
 
+# 동시 실행 워커 수 (1이면 순차 실행)
+DEFAULT_MAX_WORKERS = int(os.getenv("ORCHESTRATOR_MAX_WORKERS", "7"))
+
 SUMMARY_SYSTEM = """\
 당신은 PE 투자회사의 투자위원회(IC) 보고서 작성 전문가입니다.
 아래 에이전트 분석 결과를 종합하여 다음을 작성하세요 (한국어):
@@ -55,37 +66,131 @@ SUMMARY_SYSTEM = """\
 """
 
 
-def run(context: dict, mode: str, progress_callback=None):
-    """에이전트를 순차 실행하고 최종 요약을 생성한다.
+def run(
+    context: dict,
+    mode: str,
+    progress_callback=None,
+    max_workers: int | None = None,
+    stream_callback=None,
+):
+    """에이전트를 병렬 실행하고 최종 요약을 생성한다.
+
+    각 에이전트 호출과 종합 요약에는 model_router의 (agent_key, mode) 라우트가 적용된다.
 
     Args:
         context: 사용자 입력 딕셔너리
         mode: 보고서 모드
-        progress_callback: (agent_name, status) 콜백
+        progress_callback: (agent_name, status) 콜백. 워커 스레드에서 호출되며,
+            내부 락으로 직렬화되므로 콜백 자체는 스레드 안전할 필요가 없다.
+        max_workers: 동시 실행 에이전트 수. None이면 ORCHESTRATOR_MAX_WORKERS,
+            1이면 기존처럼 순차 실행한다.
+        stream_callback: (delta) 콜백. 지정하면 종합 요약을 스트리밍으로 생성하며
+            호출 스레드에서 텍스트 조각이 도착할 때마다 호출된다.
 
     Returns:
         dict with keys: summary, agent_results (dict of agent_key -> text)
     """
     agent_keys = MODE_AGENTS.get(mode, MODE_AGENTS["Full DD Report"])
-    agent_results = {}
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    max_workers = max(1, min(max_workers, len(agent_keys)))
 
-    for key in agent_keys:
-        label, agent_module = AGENT_MAP[key]
-        if progress_callback:
-            progress_callback(label, "실행 중...")
-        result = agent_module.run(context)
-        agent_results[key] = result
+    callback_lock = threading.Lock()
+
+    def report(label, status):
         if progress_callback:
-            progress_callback(label, "완료")
+            with callback_lock:
+                progress_callback(label, status)
+
+    def run_agent(key):
+        label, agent_module = AGENT_MAP[key]
+        report(label, "실행 중...")
+        with routed(key, mode):
+            result = agent_module.run(context)
+        report(label, "완료")
+        return result
+
+    # 전처리: 긴 업로드 자료는 에이전트 실행 전에 한 번만 사실 요약(digest)으로 추출
+    if upload_context.needs_digest(context):
+        report("업로드 자료 요약", "실행 중...")
+        upload_context.prepare(context)
+        report("업로드 자료 요약", "완료")
+
+    if max_workers == 1:
+        outputs = [run_agent(key) for key in agent_keys]
+    else:
+        # 대기 상태를 먼저 표시해 전체 에이전트 수가 진행률에 반영되도록 한다
+        for key in agent_keys:
+            report(AGENT_MAP[key][0], "대기 중...")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent") as pool:
+            outputs = list(pool.map(run_agent, agent_keys))
+
+    # 보고서 섹션 순서는 모드 정의 순서를 유지
+    agent_results = dict(zip(agent_keys, outputs))
 
     # 종합 요약 생성
-    if progress_callback:
-        progress_callback("종합 요약 생성", "실행 중...")
+    report("종합 요약 생성", "실행 중...")
+
+    user_prompt = _summary_prompt(context, mode, agent_results)
+    with routed("summary", mode):
+        if stream_callback:
+            chunks = []
+            for delta in stream_text(SUMMARY_SYSTEM, user_prompt):
+                chunks.append(delta)
+                stream_callback(delta)
+            summary = "".join(chunks).strip()
+        else:
+            summary = generate_text(SUMMARY_SYSTEM, user_prompt)
+
+    report("종합 요약 생성", "완료")
+
+    return {"summary": summary, "agent_results": agent_results}
+
+
+async def arun(context: dict, mode: str, progress_callback=None, max_concurrency: int | None = None):
+    """run의 asyncio 버전. 에이전트 호출을 하나의 이벤트 루프에서 동시에 실행한다.
+
+    progress_callback은 이벤트 루프 스레드에서 호출된다.
+    """
+    agent_keys = MODE_AGENTS.get(mode, MODE_AGENTS["Full DD Report"])
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or DEFAULT_MAX_WORKERS))
+
+    def report(label, status):
+        if progress_callback:
+            progress_callback(label, status)
+
+    async def run_agent(key):
+        label, agent_module = AGENT_MAP[key]
+        async with semaphore:
+            report(label, "실행 중...")
+            with routed(key, mode):
+                result = await agent_module.arun(context)
+        report(label, "완료")
+        return result
+
+    if upload_context.needs_digest(context):
+        report("업로드 자료 요약", "실행 중...")
+        await asyncio.to_thread(upload_context.prepare, context)
+        report("업로드 자료 요약", "완료")
+
+    for key in agent_keys:
+        report(AGENT_MAP[key][0], "대기 중...")
+    outputs = await asyncio.gather(*(run_agent(key) for key in agent_keys))
+    agent_results = dict(zip(agent_keys, outputs))
 
+    report("종합 요약 생성", "실행 중...")
+    with routed("summary", mode):
+        summary = await agenerate_text(SUMMARY_SYSTEM, _summary_prompt(context, mode, agent_results))
+    report("종합 요약 생성", "완료")
+
+    return {"summary": summary, "agent_results": agent_results}
+
+
+def _summary_prompt(context: dict, mode: str, agent_results: dict) -> str:
     combined = "\n\n---\n\n".join(
         f"### {AGENT_MAP[k][0]}\n{v}" for k, v in agent_results.items()
     )
-    user_prompt = (
+    return (
         f"보고서 모드: {mode}\n"
         f"회사명: {context.get('company_name', '미정')}\n"
         f"업종: {context.get('industry', '미정')}\n"
@@ -95,10 +200,3 @@ def run(context: dict, mode: str, progress_callback=None):
         f"리스크 선호도: {context.get('risk_preference', '미정')}\n\n"
         f"=== 에이전트 분석 결과 ===\n\n{combined}"
     )
-
-    summary = generate_text(SUMMARY_SYSTEM, user_prompt)
-
-    if progress_callback:
-        progress_callback("종합 요약 생성", "완료")
-
-    return {"summary": summary, "agent_results": agent_results}
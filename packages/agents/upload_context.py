@@ -0,0 +1,358 @@
+"""Upload Context — 업로드 자료를 에이전트별 프롬프트 입력으로 가공한다.
+
+업로드 원문이 DIGEST_MIN_CHARS보다 길면 업로드 해시당 한 번만 LLM으로
+사실 요약(digest)을 추출하고, 원문은 패시지 단위로 색인한다. 각 에이전트는
+원문 대신 digest + 자기 주제(AGENT_TOPICS) 쿼리로 검색한 top-k 원문 발췌를 받는다.
+digest 항목과 발췌 모두 위치(파일/구간)를 포함한다. 재무/DD 에이전트는 여기에
+업로드 표(context["uploaded_tables"]) 중 TABLE_KEYWORDS와 관련된 열/행만 더 받는다.
+
+업로드에 DART 사업보고서가 있으면(context["uploaded_sections"]) 각 에이전트는
+AGENT_SECTIONS에 매핑된 장/절 안의 digest 항목과 발췌만 받고, 어느 에이전트에도
+매핑되지 않은 장(상세표 등)은 digest 추출에서도 건너뛴다.
+
+환경변수:
+  - DIGEST_MIN_CHARS   : 이 길이 이상일 때 digest/발췌 사용 (기본 12000자)
+  - DIGEST_CHUNK_CHARS : digest 추출 시 한 번에 보내는 구간 크기 (기본 12000자)
+  - DIGEST_MAX_WORKERS : 구간별 추출 동시 실행 수 (기본 4)
+  - RETRIEVAL_TOP_K    : 에이전트별 원문 발췌 패시지 수 (기본 6)
+  - PASSAGE_CHARS      : 발췌 패시지 크기 (기본 1500자)
+  - TABLE_CONTEXT_CHARS: 에이전트별 관련 표 텍스트 최대 길이 (기본 6000자)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from packages.core.llm_client import generate_text
+from packages.core.model_router import routed
+from packages.rag.document_index import get_index, split_passages
+
+# 에이전트별 원문 발췌 검색 쿼리
+AGENT_TOPICS = {
+    "industry": "산업 시장 규모 성장률 수요 전망 동향 규제 정책 전방산업 market",
+    "competitor": "경쟁사 경쟁 시장점유율 점유율 경쟁우위 가격 대체재 진입장벽 competitor",
+    "consulting": "사업 전략 성장 계획 주요 제품 서비스 고객 매출 구성 신규 사업 투자 계획",
+    "dd": "재무제표 매출채권 재고자산 우발부채 소송 계약 인력 세무 내부통제 특수관계자 거래",
+    "legal": "계약 조항 소송 분쟁 제재 인허가 규제 위반 지적재산권 주주간계약 약정",
+    "finance_cost": "매출액 매출원가 판매비와관리비 영업이익 당기순이익 비용 원가 차입금 현금흐름 운전자본",
+    "exit_strategy": "상장 IPO 매각 인수 최대주주 지분 주주 구성 배당 밸류에이션 자기주식",
+    "deal_killer": (
+        "지배구조 변경 경영권 해지 독점 배타적 경업금지 중대한 부정적 변경 양도 제한 동의 승인 "
+        "change of control termination exclusivity non-compete MAC MAE assignment consent"
+    ),
+    "coc_map": (
+        "지배구조 변경 경영권 변동 최대주주 변경 동의 통지 해지권 양도 승계 계약 상대방 "
+        "change of control assignment consent"
+    ),
+    "indemnity": (
+        "손해배상 면책 배상 한도 진술 보장 존속기간 청구 절차 보증 위반 "
+        "indemnity indemnification cap basket de minimis survival"
+    ),
+    "accounting_impact": "충당부채 우발부채 수익인식 리스 손상 공정가치 회계처리 주석 보증 약정",
+}
+
+# 에이전트별 업로드 표 열/행 선택 키워드 (digest 모드에서 원문 표 대신 사용)
+TABLE_KEYWORDS = {
+    "finance_cost": [
+        "매출", "원가", "판매비", "관리비", "판관비", "영업이익", "순이익", "ebitda", "이자",
+        "자산", "부채", "자본", "차입", "현금", "재고", "채권", "채무", "비용", "인건비",
+    ],
+    "dd": [
+        "매출채권", "재고", "미지급", "충당", "우발", "차입", "특수관계", "소송", "보증",
+        "인원", "인건비", "세금", "법인세", "부채",
+    ],
+}
+
+# 에이전트별 DART 사업보고서 장/절 ("II"는 장 전체, "II-6"은 절 하나)
+AGENT_SECTIONS = {
+    "industry": ["I-1", "II"],
+    "competitor": ["II-1", "II-2", "II-4", "II-7"],
+    "consulting": ["I-1", "II", "IV"],
+    "dd": ["III-1", "III-8", "V", "X", "XI"],
+    "legal": ["VI", "VII", "X", "XI"],
+    "finance_cost": ["III-1", "III-2", "III-4", "III-6", "IV"],
+    "exit_strategy": ["I-4", "III-6", "VII", "IX"],
+    "deal_killer": ["II-6", "X", "XI"],
+    "coc_map": ["II-6", "VII", "XI"],
+    "indemnity": ["XI"],
+    "accounting_impact": ["III-3", "III-8", "V", "XI-2"],
+}
+
+_LOCATION_RANGE = re.compile(r"문자 ([\d,]+)–([\d,]+)")
+
+DIGEST_SYSTEM = """\
+당신은 PE 투자 실사팀의 자료 정리 담당 애널리스트입니다.
+아래 업로드 자료 구간에서 투자 검토에 필요한 사실만 추출하세요.
+
+출력 형식 (한국어, 마크다운 불릿만 사용):
+- [분류] 사실 요약 | "원문 인용" | 위치
+
+분류는 다음 중 하나: 회사개요, 사업/시장, 경쟁, 재무, 비용, 계약/법무, 지배구조/주주, 인력, 리스크, 기타
+
+규칙:
+- 원문에 있는 내용만 추출. 추정/해석 금지.
+- 숫자, 날짜, 당사자명, 조항 번호는 원문 그대로 인용.
+- "원문 인용"은 원문에서 그대로 복사한 짧은 문장(200자 이내).
+- 위치는 구간 머리말에 주어진 값을 그대로 사용.
+- 투자 검토와 무관한 서식, 목차, 반복 문구는 제외.
+"""
+
+# 최근 업로드 digest (키 -> (digest, 완성 여부, 만든 시각)), document_index와 같은 크기로 제한한다
+_MAX_DIGESTS = 8
+_digests = OrderedDict()
+_digest_locks = {}
+_digests_lock = threading.Lock()
+
+# 추출에 성공한 구간의 사실 목록 (구간 해시 -> 사실). 실패 구간만 다시 추출하는 데 쓴다
+_MAX_WINDOWS = 512
+_windows = OrderedDict()
+
+# llm_client가 호출 실패 시 돌려주는 메시지 접두어
+_LLM_ERROR_PREFIX = "[LLM 호출 오류]"
+# 추출에 실패한 구간 대신 넣는 원문 길이
+_FALLBACK_CHARS = 1500
+# 실패 구간이 있는 digest를 그대로 쓰는 시간(초). 한 번의 보고서 실행 동안은 다시 추출하지 않는다
+_RETRY_AFTER = 300
+
+
+def _upload_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _extract_window(label: str, chunk: str) -> tuple[str, bool]:
+    """구간 하나의 사실 목록과 성공 여부. 실패하면 한 번 더 시도하고, 그래도 안 되면 원문 앞부분으로 대신한다.
+
+    성공한 구간은 구간 해시로 캐시해 두므로, digest를 다시 만들 때는 실패했던 구간만 LLM을 부른다.
+    """
+    key = _upload_hash(f"{label}\0{chunk}")
+    with _digests_lock:
+        if key in _windows:
+            _windows.move_to_end(key)
+            return _windows[key], True
+    with routed("digest"):
+        for _ in range(2):
+            facts = generate_text(DIGEST_SYSTEM, f"[위치] {label}\n\n{chunk}")
+            if not facts.startswith(_LLM_ERROR_PREFIX):
+                with _digests_lock:
+                    _windows[key] = facts
+                    while len(_windows) > _MAX_WINDOWS:
+                        _windows.popitem(last=False)
+                return facts, True
+    excerpt = chunk[:_FALLBACK_CHARS].strip()
+    return f"- [원문 발췌] (사실 추출 실패, 원문 일부) | \"{excerpt}\" | {label}", False
+
+
+def build_digest(uploaded_text: str, skip=()) -> str:
+    """업로드 원문에서 구간별로 사실을 추출해 하나의 digest로 합친다 (해시당 1회).
+
+    skip: 추출하지 않을 (start, end) 문자 구간. 이 안에 완전히 들어가는 구간은 건너뛴다.
+    추출에 실패한 구간은 원문 발췌로 대신한다. 그런 digest는 _RETRY_AFTER초 동안만
+    재사용하고(같은 실행의 다른 에이전트는 다시 추출하지 않는다), 그 뒤 요청에서
+    실패했던 구간만 다시 추출한다.
+    """
+    key = _upload_hash(uploaded_text) + repr(sorted(skip))
+    with _digests_lock:
+        cached = _fresh_digest(key)
+        if cached is not None:
+            return cached
+        lock = _digest_locks.setdefault(key, threading.Lock())
+
+    # 같은 업로드에 대한 동시 요청은 먼저 들어온 한 건만 실제로 추출한다
+    with lock:
+        with _digests_lock:
+            cached = _fresh_digest(key)
+            if cached is not None:
+                return cached
+        size = int(os.getenv("DIGEST_CHUNK_CHARS", "12000"))
+        workers = int(os.getenv("DIGEST_MAX_WORKERS", "4"))
+        windows = [w for w in split_passages(uploaded_text, size) if not _inside(w["start"], w["end"], skip)]
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="digest") as pool:
+            results = list(pool.map(lambda w: _extract_window(w["location"], w["text"]), windows))
+        digest = "\n".join(f.strip() for f, _ in results if f.strip())
+        with _digests_lock:
+            _digests[key] = (digest, all(ok for _, ok in results), time.monotonic())
+            _digests.move_to_end(key)
+            while len(_digests) > _MAX_DIGESTS:
+                _digests.popitem(last=False)
+            _digest_locks.pop(key, None)
+        return digest
+
+
+def _fresh_digest(key: str) -> str | None:
+    """캐시된 digest. 실패 구간이 있는 digest는 _RETRY_AFTER초가 지나면 None (_digests_lock 안에서 호출)."""
+    entry = _digests.get(key)
+    if entry is None:
+        return None
+    digest, complete, built = entry
+    if not complete and time.monotonic() - built >= _RETRY_AFTER:
+        return None
+    _digests.move_to_end(key)
+    return digest
+
+
+def needs_digest(context: dict) -> bool:
+    uploaded = context.get("uploaded_text", "")
+    return len(uploaded) >= int(os.getenv("DIGEST_MIN_CHARS", "12000"))
+
+
+def _passage_chars() -> int:
+    return int(os.getenv("PASSAGE_CHARS", "1500"))
+
+
+def prepare(context: dict):
+    """오케스트레이터 전처리 단계: 에이전트 실행 전에 digest와 패시지 인덱스를 만들어 둔다."""
+    if needs_digest(context):
+        get_index(context["uploaded_text"], _passage_chars())
+        build_digest(context["uploaded_text"], excluded_ranges(context))
+
+
+# ═══════════════════════════════════════════
+# DART 사업보고서 장/절 라우팅
+# ═══════════════════════════════════════════
+
+def _inside(start: int, end: int, ranges) -> bool:
+    return any(lo <= start and end <= hi for lo, hi in ranges)
+
+
+def _selected_sections(sections, wanted) -> list:
+    """wanted 번호에 해당하는 섹션. 절을 못 찾으면 그 절이 속한 장 전체를 쓴다."""
+    by_number = {s.number: s for s in sections}
+    chosen = {}
+    for number in wanted:
+        section = by_number.get(number) or by_number.get(number.split("-")[0])
+        if section is not None:
+            chosen[section.number] = section
+    return sorted(chosen.values(), key=lambda s: s.start)
+
+
+def _wanted(agent_key: str | None):
+    if agent_key is None:
+        return {n for numbers in AGENT_SECTIONS.values() for n in numbers}
+    return AGENT_SECTIONS.get(agent_key)
+
+
+def _report_bodies(context: dict):
+    """(uploaded_text 안의 파일 본문 시작 위치, 섹션 목록)을 사업보고서마다 낸다."""
+    uploaded = context.get("uploaded_text", "")
+    for name, sections in (context.get("uploaded_sections") or {}).items():
+        header = f"[파일: {name}]\n"
+        pos = uploaded.find(header)
+        if pos >= 0 and sections:
+            yield pos + len(header), sections
+
+
+def excluded_ranges(context: dict, agent_key: str | None = None) -> list[tuple[int, int]]:
+    """사업보고서 본문 중 agent_key(None이면 모든 에이전트)에 매핑되지 않은 문자 구간.
+
+    표지/목차와 매핑되지 않은 장/절이 들어간다. 위치는 uploaded_text 기준.
+    """
+    wanted = _wanted(agent_key)
+    if not wanted:
+        return []
+    ranges = []
+    for base, sections in _report_bodies(context):
+        cursor = 0
+        for section in _selected_sections(sections, wanted):
+            if section.start > cursor:
+                ranges.append((base + cursor, base + section.start))
+            cursor = max(cursor, section.end)
+        end = max(s.end for s in sections)
+        if end > cursor:
+            ranges.append((base + cursor, base + end))
+    return ranges
+
+
+def section_outline(context: dict, agent_key: str) -> str:
+    """agent_key에 넘기는 사업보고서 장/절 목록 (예: "II. 사업의 내용 (p.28–73)")."""
+    wanted = _wanted(agent_key)
+    if not wanted:
+        return ""
+    items = []
+    for _, sections in _report_bodies(context):
+        for section in _selected_sections(sections, wanted):
+            number = section.number.replace("-", ".")
+            pages = f" (p.{section.page_start}–{section.page_end})" if section.page_start else ""
+            items.append(f"{number}. {section.title}{pages}")
+    return ", ".join(items)
+
+
+def _filter_digest(digest: str, exclude) -> str:
+    """위치가 exclude 구간 안에 있는 digest 항목을 뺀다."""
+    kept = []
+    for line in digest.splitlines():
+        match = _LOCATION_RANGE.search(line)
+        if match:
+            start, end = (int(g.replace(",", "")) for g in match.groups())
+            if _inside(start, end, exclude):
+                continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def relevant_excerpts(context: dict, agent_key: str, exclude=()) -> list[dict]:
+    """agent_key 주제와 관련된 원문 패시지 top-k (원문 순서). exclude 구간 안의 패시지는 제외."""
+    query = AGENT_TOPICS.get(agent_key)
+    if not query:
+        return []
+    index = get_index(context["uploaded_text"], _passage_chars())
+    return index.retrieve(
+        query,
+        int(os.getenv("RETRIEVAL_TOP_K", "6")),
+        keep=lambda p: not _inside(p["start"], p["end"], exclude),
+    )
+
+
+def relevant_tables(context: dict, agent_key: str) -> str:
+    """agent_key 키워드와 관련된 업로드 표의 열/행만 직렬화한 텍스트."""
+    keywords = TABLE_KEYWORDS.get(agent_key)
+    tables = context.get("uploaded_tables") or []
+    if not keywords or not tables:
+        return ""
+    limit = int(os.getenv("TABLE_CONTEXT_CHARS", "6000"))
+    parts = []
+    used = 0
+    for table in tables:
+        text = f"({table.source})\n{table.select(keywords).to_text()}"
+        if used + len(text) > limit:
+            break
+        parts.append(text)
+        used += len(text)
+    return "\n\n".join(parts)
+
+
+def upload_text_for(context: dict, agent_key: str, include_tables: bool = True) -> str:
+    """agent_key 에이전트 프롬프트에 넣을 업로드 자료 텍스트.
+
+    짧은 업로드는 원문 그대로, 긴 업로드는 사실 요약(digest)과
+    에이전트 주제 관련 원문 발췌를 반환한다. include_tables=False면
+    관련 표 발췌를 생략한다 (지표를 따로 계산해 넣는 경우).
+    """
+    uploaded = context.get("uploaded_text", "")
+    if not uploaded or not needs_digest(context):
+        return uploaded
+    digest = build_digest(uploaded, excluded_ranges(context))
+    exclude = excluded_ranges(context, agent_key)
+    if exclude:
+        digest = _filter_digest(digest, exclude)
+    parts = [
+        f"(원문 {len(uploaded):,}자에서 추출한 사실 요약. 각 항목은 원문 인용과 위치를 포함)",
+        digest,
+    ]
+    outline = section_outline(context, agent_key)
+    if outline:
+        parts.insert(0, f"(사업보고서는 다음 장/절만 발췌: {outline})")
+    excerpts = relevant_excerpts(context, agent_key, exclude)
+    if excerpts:
+        parts.append("\n[관련 원문 발췌]")
+        for passage in excerpts:
+            parts.append(f"--- {passage['location']} ---\n{passage['text']}")
+    tables = relevant_tables(context, agent_key) if include_tables else ""
+    if tables:
+        parts.append("\n[관련 표]")
+        parts.append(tables)
+    return "\n".join(parts)
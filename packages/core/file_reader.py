@@ -1,81 +1,770 @@
-"""다양한 파일 형식에서 텍스트를 추출한다."""
+"""다양한 파일 형식에서 텍스트를 추출한다.
+
+iter_records는 파일을 페이지/시트 행 묶음/문단 단위의 ExtractRecord로 차례로
+내보내는 제너레이터다. 대용량 Excel/PDF도 전체를 메모리에 올리지 않고 청킹,
+digest, 미리보기 같은 후속 단계를 먼저 시작할 수 있다. extract_text는 그 위에서
+기존과 같은 형식의 문자열을 만든다.
+
+PDF는 페이지마다 반복되는 머리말/꼬리말/쪽번호를 지우고 공백과 끊긴 한글 줄을
+정리한다 (normalize_pages). 줄어든 토큰 수는 extraction_stats로 확인한다.
+
+segment_dart/dart_sections는 DART 사업보고서 PDF의 장(I~XII)/절 목차를 페이지
+범위와 함께 만들어, 에이전트별로 필요한 장만 넘길 수 있게 한다.
+
+extract_text 결과는 (파일 내용 해시, 확장자, EXTRACTOR_VERSION, 행 제한)을 키로
+메모리 LRU에 캐시되므로 Streamlit 재실행마다 같은 파일을 다시 파싱하지 않는다.
+항목 하나가 파일 하나이고, 통계/DART 목차/표 같은 파생 결과는 그 항목의 필드로
+함께 둔다. 내용 해시는 업로드 객체마다 한 번만 계산한다 (upload_key).
+FILE_CACHE_DIR을 지정하면 문자열 필드를 디스크에도 저장해 프로세스 재시작 후에도 재사용한다.
+
+환경변수:
+  - FILE_CACHE_MAX_ENTRIES : 메모리 캐시 최대 파일 수 (기본 32)
+  - FILE_CACHE_DIR         : 디스크 캐시 디렉터리 (기본 없음 = 메모리만)
+  - PDF_PARALLEL_MIN_PAGES : 이 페이지 수 이상인 PDF는 프로세스 풀로 병렬 추출 (기본 40)
+  - PDF_MAX_PROCESSES      : PDF 추출 프로세스 수 (기본 CPU 코어 수, 1이면 순차)
+  - EXTRACT_MAX_WORKERS    : extract_many 동시 추출 파일 수 (기본 4)
+  - FILE_MAX_MB            : 파일당 최대 크기(MB), 초과 시 추출하지 않음 (기본 200)
+  - EXTRACT_MAX_ROWS       : 시트(CSV는 파일)당 최대 추출 행 수 (기본 100000)
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+# 추출 로직이 바뀌면 올려서 기존 캐시를 무효화한다
+EXTRACTOR_VERSION = "5"
+
+# Excel/CSV 레코드 하나에 묶는 행 수
+ROWS_PER_RECORD = 200
+
+# 파일 하나 = 항목 하나: 캐시 키 -> {필드: 값}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+# 업로드 객체 -> (이름, 크기, 내용 해시). 같은 객체를 여러 추출 함수가 받아도 해시는 한 번
+_upload_digests = weakref.WeakKeyDictionary()
+_upload_digests_lock = threading.Lock()
+
+# extract_many 안에서는 작은 PDF도 통째로 프로세스 풀에서 파싱한다
+_in_batch = contextvars.ContextVar("extract_in_batch", default=False)
+
+
+@dataclass
+class ExtractRecord:
+    """추출 결과 한 단위.
+
+    kind: "text" | "page" | "sheet" | "rows" | "paragraph" | "table" | "notice" | "error"
+      - sheet  : 시트 시작 표시 (text는 "[Sheet: 이름]")
+      - rows   : Excel/CSV 행 묶음 (row_start~row_end, 1부터)
+      - table  : Word 표 하나 (row_start~row_end는 표 안의 행 번호)
+      - notice : 크기/행 제한으로 일부를 생략했다는 안내
+      - error  : 읽기 실패. 이후 레코드는 없다
+    """
+    source: str
+    kind: str
+    text: str
+    page: int | None = None
+    sheet: str | None = None
+    row_start: int | None = None
+    row_end: int | None = None
+
+
+def row_limit() -> int:
+    """표 형식(Excel/CSV/Word 표)에서 추출할 최대 행 수 (EXTRACT_MAX_ROWS)."""
+    return int(os.getenv("EXTRACT_MAX_ROWS", "100000"))
+
+
+def row_limit_notice(max_rows: int, number: int) -> str:
+    """행 제한으로 number행부터 생략했다는 안내 (표 추출도 같은 문구를 쓴다)."""
+    return f"[행 제한: {max_rows:,}행까지만 추출하고 {number}행부터 생략했습니다]"
+
+
+def read_upload(file_obj) -> bytes:
+    """업로드 객체를 처음부터 다시 읽어 바이트로 반환한다."""
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return file_obj.read()
+
+
+def iter_records(file_obj) -> Iterator[ExtractRecord]:
+    """업로드된 파일을 ExtractRecord로 차례로 내보낸다.
+
+    지원 형식: txt, pdf, docx, xlsx, xls, csv
+    """
+    source = file_obj.name
+    # 업로드 객체가 크기를 알려주면 읽기 전에 거른다
+    error = size_error(file_obj)
+    if error:
+        yield ExtractRecord(source, "error", error)
+        return
+    data = read_upload(file_obj)
+    error = size_error(file_obj, data)
+    if error:
+        yield ExtractRecord(source, "error", error)
+        return
+    yield from _iter_data(source, data)
+
+
+def size_error(file_obj, data: bytes | None = None) -> str | None:
+    """업로드가 FILE_MAX_MB를 넘으면 오류 메시지, 아니면 None.
+
+    data를 주면 읽은 바이트 길이로, 없으면 업로드 객체의 size 속성으로 판단한다.
+    표 추출(table_reader) 등 파일을 직접 읽는 경로도 이 검사를 거친다.
+    """
+    max_bytes = float(os.getenv("FILE_MAX_MB", "200")) * 1024 * 1024
+    size = len(data) if data is not None else getattr(file_obj, "size", None)
+    if size is None or size <= max_bytes:
+        return None
+    return f"[파일 읽기 실패: 크기 {size / 1024 / 1024:,.1f}MB가 제한 {max_bytes / 1024 / 1024:,.0f}MB를 넘습니다]"
 
 
 def extract_text(file_obj) -> str:
-    """업로드된 파일에서 텍스트를 추출한다.
+    """업로드된 파일에서 텍스트를 추출한다. 같은 내용의 파일은 한 번만 파싱한다.
 
     지원 형식: txt, pdf, docx, xlsx, xls, csv
     """
+    source = file_obj.name
+    key = upload_key(file_obj)
+    cached = cache_get(key)
+    if cached is not None:
+        return cached
+
+    # 크기 제한 확인은 iter_records에 맡긴다 (이미 읽은 버퍼를 다시 읽는다)
+    records = []
+    for record in iter_records(file_obj):
+        if record.kind == "error":
+            return record.text
+        records.append(record)
+
+    if source.lower().endswith(".pdf"):
+        raw_pages = [r.text for r in records]
+        pages, removed = normalize_pages(raw_pages)
+        text = "\n\n".join(pages)
+        # 페이지 위치는 추출할 때만 알 수 있으므로 사업보고서 목차도 함께 만들어 둔다
+        page_starts = []
+        offset = 0
+        for record, page in zip(records, pages):
+            page_starts.append((offset, record.page))
+            offset += len(page) + 2
+        cache_put(
+            key,
+            text=text,
+            stats=json.dumps(_stats("\n\n".join(raw_pages), text, removed)),
+            dart=_dump_sections(segment_dart(text, page_starts)),
+        )
+        return text
+
+    text = "\n".join(r.text for r in records)
+    cache_put(key, text=text)
+    return text
+
+
+def extraction_stats(file_obj) -> dict | None:
+    """extract_text 정규화로 줄어든 분량. PDF만 해당하고, 아직 추출 전이면 None.
+
+    Returns:
+        {"raw_chars", "chars", "raw_tokens", "tokens", "saved_tokens", "removed_lines"}
+    """
     name = file_obj.name.lower()
-    data = file_obj.read()
+    if not name.endswith(".pdf"):
+        return None
+    raw = cache_get(upload_key(file_obj), "stats")
+    return json.loads(raw) if raw else None
 
-    if name.endswith(".txt") or name.endswith(".csv"):
-        return data.decode("utf-8", errors="replace")
 
-    if name.endswith(".pdf"):
-        return _read_pdf(data)
+def extract_many(files, extract=None, progress_callback=None, max_workers=None) -> list:
+    """여러 업로드 파일을 동시에 추출한다. 결과는 업로드 순서대로 반환한다.
 
-    if name.endswith(".docx"):
-        return _read_docx(data)
+    파일마다 스레드에서 extract(file_obj)(기본 extract_text)를 실행하고, PDF 페이지
+    파싱은 페이지 수와 관계없이 프로세스 풀에서 돈다 (Excel/Word/텍스트는 스레드).
 
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        return _read_excel(data)
+    Args:
+        extract: 파일 하나를 처리할 함수. 표/목차까지 함께 뽑을 때 바꿔 끼운다.
+        progress_callback: (파일명, 상태, 소요 초) 콜백. 워커가 아닌 호출한 스레드에서
+            처음에 "대기 중..."(소요 초 None), 파일이 끝날 때마다 "완료"로 불린다.
+        max_workers: 동시 추출 파일 수 (기본 EXTRACT_MAX_WORKERS)
+    """
+    extract = extract or extract_text
+    files = list(files)
+    workers = max_workers or int(os.getenv("EXTRACT_MAX_WORKERS", "4"))
+    if progress_callback:
+        for f in files:
+            progress_callback(f.name, "대기 중...", None)
 
-    # 알 수 없는 형식 → 텍스트로 시도
-    return data.decode("utf-8", errors="replace")
+    results = [None] * len(files)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="extract") as pool:
+        futures = {pool.submit(_timed_extract, extract, f): i for i, f in enumerate(files)}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index], seconds = future.result()
+            if progress_callback:
+                progress_callback(files[index].name, "완료", seconds)
+    return results
 
 
-def _read_pdf(data: bytes) -> str:
+def _timed_extract(extract, file_obj):
+    token = _in_batch.set(True)
+    start = time.perf_counter()
     try:
-        import io
-        import PyPDF2
-        reader = PyPDF2.PdfReader(io.BytesIO(data))
-        pages = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                pages.append(text)
-        return "\n\n".join(pages)
+        return extract(file_obj), time.perf_counter() - start
+    finally:
+        _in_batch.reset(token)
+
+
+def _iter_data(source: str, data: bytes) -> Iterator[ExtractRecord]:
+    name = source.lower()
+    if name.endswith(".csv"):
+        yield from _iter_csv(source, data)
+    elif name.endswith(".pdf"):
+        yield from _iter_pdf(source, data)
+    elif name.endswith(".docx"):
+        yield from _iter_docx(source, data)
+    elif name.endswith(".xlsx") or name.endswith(".xls"):
+        yield from _iter_excel(source, data)
+    else:
+        # txt 및 알 수 없는 형식 → 텍스트로 시도
+        yield ExtractRecord(source, "text", data.decode("utf-8", errors="replace"))
+
+
+# ═══════════════════════════════════════════
+# PDF 텍스트 정규화
+# ═══════════════════════════════════════════
+
+# 페이지 위/아래에서 머리말/꼬리말 후보로 보는 줄 수
+_EDGE_LINES = 3
+# 이 비율 이상의 페이지에서 반복되는 가장자리 줄은 머리말/꼬리말로 본다
+_REPEAT_RATIO = 0.5
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_LIST_MARKER = re.compile(r"^(?:[-•·※☞○●▶\(\[<]|\d{1,2}[.)]|[가-하][.)]|[IVX]{1,5}\.)")
+_SENTENCE_END = ("다.", ".", "!", "?", ":", ";")
+# 페이지마다 반복돼도 본문인 줄: 단위 표기, 표/그림 캡션, 주석 머리
+_KEEP_LINE = re.compile(r"단위\s*[:：)]|^[\[<(]?\s*(?:표|그림|도표|주석|Table|Figure)\s*[\d.\-]+", re.IGNORECASE)
+# 줄 첫머리에 홀로 온 조사 → 어절 중간에서 줄바꿈된 것이므로 공백 없이 붙인다
+_PARTICLE_START = re.compile(r"^(?:은|는|을|를|에서|에게|에|으로|로|와|과|의)(?=[\s,.)]|$)")
+
+# 숫자를 무시하고 비교하는 쪽 번호 줄: "12", "- 12 -", "Page 3", "3 / 10", "3쪽"
+_PAGE_NUMBER = re.compile(r"^\W*(?:page\s*)?\d+(?:\s*(?:/|of)\s*\d+)?\s*(?:쪽|페이지)?\W*$", re.IGNORECASE)
+
+_HASH_BASE = 131
+_HASH_MOD = (1 << 61) - 1
+
+
+def _rolling_hash(line: str) -> int:
+    """공백을 없앤 줄의 다항식 롤링 해시.
+
+    쪽 번호만 있는 줄(_PAGE_NUMBER)만 숫자를 무시한다("Page 25"와 "Page 26"은 같은 값).
+    "합계 1,234"나 날짜 줄처럼 숫자가 내용인 줄은 짧아도 숫자가 다르면 다른 줄이다.
+    """
+    if _PAGE_NUMBER.match(line):
+        line = _DIGITS.sub("#", line)
+    h = 0
+    for ch in line.replace(" ", ""):
+        h = (h * _HASH_BASE + ord(ch)) % _HASH_MOD
+    return h
+
+
+def _is_hangul(ch: str) -> bool:
+    return "가" <= ch <= "힣"
+
+
+def normalize_pages(pages: list[str]) -> tuple[list[str], int]:
+    """페이지 텍스트 목록에서 반복 머리말/꼬리말을 지우고 공백과 끊긴 줄을 정리한다.
+
+    1. 각 페이지 위/아래 _EDGE_LINES 줄의 롤링 해시 빈도를 세어, 전체 페이지의
+       _REPEAT_RATIO 이상(최소 3페이지)에서 반복되는 줄을 제거한다.
+       단위 표기/캡션(_KEEP_LINE)은 반복돼도 지우지 않는다.
+    2. 연속 공백을 하나로, 빈 줄 여러 개를 하나로 줄인다.
+    3. 폭이 꽉 찬 줄이 문장 중간에서 끊겼으면 다음 줄과 공백 하나로 잇는다
+       (다음 줄이 조사로 시작해 어절 중간에서 끊긴 게 분명할 때만 붙여서).
+
+    Returns:
+        (정규화된 페이지 목록, 제거한 머리말/꼬리말 줄 수)
+    """
+    split = [[_SPACES.sub(" ", line).strip() for line in page.split("\n")] for page in pages]
+
+    counts = {}
+    for lines in split:
+        content = [i for i, line in enumerate(lines) if line]
+        edges = set(content[:_EDGE_LINES] + content[-_EDGE_LINES:])
+        for h in {_rolling_hash(lines[i]) for i in edges if not _KEEP_LINE.search(lines[i])}:
+            counts[h] = counts.get(h, 0) + 1
+    threshold = max(3, int(len(pages) * _REPEAT_RATIO))
+    repeated = {h for h, n in counts.items() if n >= threshold} if len(pages) >= 4 else set()
+
+    lengths = sorted(len(line) for lines in split for line in lines if line)
+    width = lengths[int(len(lengths) * 0.9)] if lengths else 0
+
+    removed = 0
+    result = []
+    for lines in split:
+        content = [i for i, line in enumerate(lines) if line]
+        edges = set(content[:_EDGE_LINES] + content[-_EDGE_LINES:])
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges and _rolling_hash(line) in repeated:
+                removed += 1
+                continue
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            prev = kept[-1] if kept else ""
+            if prev and _wrapped(prev, line, width):
+                sep = "" if _is_hangul(prev[-1]) and _PARTICLE_START.match(line) else " "
+                kept[-1] = prev + sep + line
+            else:
+                kept.append(line)
+        result.append("\n".join(kept).strip())
+    return result, removed
+
+
+def _wrapped(prev: str, line: str, width: int) -> bool:
+    """prev가 폭 때문에 줄바꿈되어 line으로 이어지는 문장인지."""
+    if width <= 0 or len(prev) < width * 0.85:
+        return False
+    if prev.endswith(_SENTENCE_END) or _LIST_MARKER.match(line):
+        return False
+    last, first = prev[-1], line[0]
+    return (_is_hangul(last) or last in ",)") and (_is_hangul(first) or first.isalnum())
+
+
+def _stats(raw: str, text: str, removed: int) -> dict:
+    from packages.core.llm_scheduler import estimate_tokens
+    raw_tokens = estimate_tokens(raw)
+    tokens = estimate_tokens(text)
+    return {
+        "raw_chars": len(raw),
+        "chars": len(text),
+        "raw_tokens": raw_tokens,
+        "tokens": tokens,
+        "saved_tokens": raw_tokens - tokens,
+        "removed_lines": removed,
+    }
+
+
+# ═══════════════════════════════════════════
+# DART 사업보고서 목차
+# ═══════════════════════════════════════════
+
+@dataclass
+class Section:
+    """사업보고서 장/절 하나. start/end는 extract_text 결과 안의 문자 위치."""
+    number: str  # 장은 "II", 절은 "II-1"
+    title: str
+    start: int
+    end: int
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+# 목차 페이지의 "I. 회사의 개요......" 줄은 점선 때문에 맞지 않는다
+_CHAPTER = re.compile(r"^[ \t]*([IVX]{1,5})\.[ \t]*([^\n.]{2,40}?)[ \t]*$", re.MULTILINE)
+_SUBSECTION = re.compile(r"^[ \t]*(\d{1,2})\.[ \t]*([^\n.]{2,30}?)[ \t]*$", re.MULTILINE)
+_ROMAN = {"I": 1, "V": 5, "X": 10}
+
+# 절 번호가 주석 번호("4. 범주별 금융상품")와 겹치는 장은 공시서식의 절 제목만 인정한다
+DART_SUBSECTIONS = {
+    "II": [
+        "사업의 개요", "주요 제품 및 서비스", "원재료 및 생산설비", "매출 및 수주상황",
+        "위험관리 및 파생거래", "주요계약 및 연구개발활동", "기타 참고사항",
+    ],
+    "III": [
+        "요약재무정보", "연결재무제표", "연결재무제표 주석", "재무제표", "재무제표 주석",
+        "배당에 관한 사항", "증권의 발행을 통한 자금조달에 관한 사항", "기타 재무에 관한 사항",
+    ],
+}
+
+
+def _roman(numeral: str) -> int:
+    total = 0
+    for i, ch in enumerate(numeral):
+        value = _ROMAN[ch]
+        total += -value if i + 1 < len(numeral) and _ROMAN[numeral[i + 1]] > value else value
+    return total
+
+
+def _after_blank_line(text: str, pos: int) -> bool:
+    """pos가 문서/페이지 시작이거나 빈 줄 바로 다음 줄인지."""
+    before = text[:pos].rstrip(" \t")
+    if not before:
+        return True
+    if not before.endswith("\n"):
+        return False
+    prev_line = before[:-1].rsplit("\n", 1)[-1]
+    return not prev_line.strip()
+
+
+def segment_dart(text: str, page_starts=None) -> list[Section]:
+    """DART 사업보고서 텍스트에서 장(I~XII)과 절(1., 2., ...) 목차를 만든다.
+
+    장은 I부터 번호가 하나씩 늘어나는 머리말만, 절은 장 안에서 1부터 번호가
+    이어지고 빈 줄 뒤에 오는 짧은 제목 줄만 인정한다 (DART_SUBSECTIONS에 있는
+    장은 서식상 절 제목만). 장이 3개 미만이면
+    사업보고서가 아닌 것으로 보고 빈 리스트를 반환한다.
+
+    Args:
+        page_starts: [(문자 위치, 페이지 번호)] 오름차순. 있으면 각 섹션에 페이지 범위를 붙인다.
+    """
+    chapters = []
+    for match in _CHAPTER.finditer(text):
+        if _roman(match.group(1)) == len(chapters) + 1 and _after_blank_line(text, match.start()):
+            chapters.append((match.group(1), match.group(2).strip(), match.start()))
+    if len(chapters) < 3:
+        return []
+
+    sections = []
+    bounds = [c[2] for c in chapters[1:]] + [len(text)]
+    for (number, title, start), end in zip(chapters, bounds):
+        sections.append(Section(number, title, start, end))
+        known = {t.replace(" ", "") for t in DART_SUBSECTIONS.get(number, [])}
+        subs = []
+        for match in _SUBSECTION.finditer(text, start, end):
+            sub_title = match.group(2).strip()
+            if known and sub_title.replace(" ", "") not in known:
+                continue
+            if int(match.group(1)) == len(subs) + 1 and _after_blank_line(text, match.start()):
+                subs.append((match.group(1), sub_title, match.start()))
+        sub_bounds = [s[2] for s in subs[1:]] + [end]
+        for (sub_no, sub_title, sub_start), sub_end in zip(subs, sub_bounds):
+            sections.append(Section(f"{number}-{sub_no}", sub_title, sub_start, sub_end))
+
+    if page_starts:
+        offsets = [offset for offset, _ in page_starts]
+        for section in sections:
+            section.page_start = page_starts[max(bisect_right(offsets, section.start) - 1, 0)][1]
+            section.page_end = page_starts[max(bisect_right(offsets, section.end - 1) - 1, 0)][1]
+    return sections
+
+
+def dart_sections(file_obj) -> list[Section]:
+    """업로드된 PDF가 DART 사업보고서면 장/절 목차, 아니면 빈 리스트."""
+    name = file_obj.name.lower()
+    if not name.endswith(".pdf"):
+        return []
+    key = upload_key(file_obj)
+    raw = cache_get(key, "dart")
+    if raw is None:
+        text = extract_text(file_obj)
+        raw = cache_get(key, "dart")
+        if raw is None:
+            # 텍스트만 캐시에 남아 있던 경우: 페이지 정보 없이 목차를 만든다
+            raw = _dump_sections(segment_dart(text))
+            cache_put(key, dart=raw)
+    return [Section(**item) for item in json.loads(raw)]
+
+
+def _dump_sections(sections: list[Section]) -> str:
+    return json.dumps([asdict(s) for s in sections], ensure_ascii=False)
+
+
+# ═══════════════════════════════════════════
+# 추출 캐시
+# ═══════════════════════════════════════════
+
+def cache_key(name: str, data: bytes) -> str:
+    """파일 내용 해시 + 확장자 + 추출기 버전 + 행 제한."""
+    return _format_key(name, hashlib.sha256(data).hexdigest())
+
+
+def _format_key(name: str, digest: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return f"{digest}{ext}.v{EXTRACTOR_VERSION}.r{row_limit()}"
+
+
+def upload_key(file_obj) -> str:
+    """업로드 객체의 캐시 키 (cache_key). 내용 해시는 객체마다 한 번만 계산한다.
+
+    같은 객체라도 이름이나 크기가 바뀌었으면 다시 해시한다. 약한 참조를 만들 수 없는
+    객체는 매번 해시한다.
+    """
+    name = file_obj.name
+    size = getattr(file_obj, "size", None)
+    data = None
+    if size is None:
+        data = read_upload(file_obj)
+        size = len(data)
+    try:
+        with _upload_digests_lock:
+            memo = _upload_digests.get(file_obj)
+    except TypeError:
+        memo = None
+    if memo is not None and memo[:2] == (name, size):
+        return _format_key(name, memo[2])
+
+    digest = hashlib.sha256(data if data is not None else read_upload(file_obj)).hexdigest()
+    try:
+        with _upload_digests_lock:
+            _upload_digests[file_obj] = (name, size, digest)
+    except TypeError:
+        pass
+    return _format_key(name, digest)
+
+
+def _disk_path(key: str, field: str):
+    cache_dir = os.getenv("FILE_CACHE_DIR", "")
+    if not cache_dir:
+        return None
+    return Path(cache_dir) / (f"{key}.txt" if field == "text" else f"{key}.{field}.txt")
+
+
+def cache_get(key: str, field: str = "text"):
+    """파일 항목의 field 값. 메모리 LRU, 없으면 FILE_CACHE_DIR 디스크 캐시에서 찾는다. 없으면 None."""
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            if field in entry:
+                return entry[field]
+    path = _disk_path(key, field)
+    if path is not None and path.exists():
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        cache_put(key, persist=False, **{field: text})
+        return text
+    return None
+
+
+def cache_put(key: str, persist: bool = True, **fields):
+    """파일 항목에 필드들을 넣는다 (text, stats, dart, tables-csv 등).
+
+    FILE_CACHE_MAX_ENTRIES는 파일 수이므로 필드가 늘어도 항목 수는 그대로다.
+    persist이면 문자열 필드를 디스크 캐시에도 쓴다 (표 객체 같은 값은 메모리에만 둔다).
+    """
+    max_entries = int(os.getenv("FILE_CACHE_MAX_ENTRIES", "32"))
+    with _cache_lock:
+        _cache.setdefault(key, {}).update(fields)
+        _cache.move_to_end(key)
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+    if not persist:
+        return
+    for field, value in fields.items():
+        path = _disk_path(key, field) if isinstance(value, str) else None
+        if path is None:
+            continue
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(value, encoding="utf-8")
+        except OSError:
+            pass
+
+
+# ═══════════════════════════════════════════
+# 형식별 파서
+# ═══════════════════════════════════════════
+
+def _iter_pdf(source: str, data: bytes) -> Iterator[ExtractRecord]:
+    try:
+        for page, text in _iter_pdf_pages(data):
+            yield ExtractRecord(source, "page", text, page=page)
     except ImportError:
-        return "[PDF 읽기 실패: PyPDF2 패키지가 필요합니다. pip install PyPDF2]"
+        yield ExtractRecord(source, "error", "[PDF 읽기 실패: PyPDF2 패키지가 필요합니다. pip install PyPDF2]")
     except Exception as e:
-        return f"[PDF 읽기 오류: {e}]"
+        yield ExtractRecord(source, "error", f"[PDF 읽기 오류: {e}]")
+
+
+def _iter_pdf_pages(data: bytes) -> Iterator[tuple[int, str]]:
+    """PDF를 (페이지 번호(1부터), 텍스트)로 차례로 내보낸다. 텍스트가 없는 페이지는 제외.
+
+    PDF_PARALLEL_MIN_PAGES 이상이면 페이지 구간을 프로세스 풀에 나눠 추출하고,
+    앞 구간부터 완료되는 대로 페이지 순서대로 내보낸다. extract_many 안에서는
+    작은 PDF도 프로세스 풀에서 통째로 추출한다.
+    """
+    import io
+    import PyPDF2
+    page_count = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+    workers = _pdf_workers()
+    large = page_count >= int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+    if workers <= 1 or page_count == 0 or not (large or _in_batch.get()):
+        yield from _iter_pdf_range(data, 0, page_count)
+        return
 
+    if large:
+        # 워커 수의 두 배로 쪼개 페이지별 처리 시간 편차를 흡수한다
+        shard = max(1, -(-page_count // (workers * 2)))
+    else:
+        # 일괄 추출 중인 작은 PDF는 파일 하나를 프로세스 하나에서 처리한다
+        shard = page_count
+    ranges = [(s, min(s + shard, page_count)) for s in range(0, page_count, shard)]
+    # 워커마다 PDF 바이트를 피클로 복사해 보내지 않도록 임시 파일에 한 번만 쓰고 경로만 넘긴다
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="extract-")
+    done = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            pool = _get_pdf_pool(workers)
+            futures = [pool.submit(_pdf_page_range, path, s, e) for s, e in ranges]
+            for (_, end), future in zip(ranges, futures):
+                pages = future.result()
+                yield from pages
+                done = end
+        except BrokenProcessPool:
+            _reset_pdf_pool()
+            yield from _iter_pdf_range(data, done, page_count)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _read_pdf_pages(data: bytes) -> list[tuple[int, str]]:
+    """PDF 전체를 [(페이지 번호, 텍스트)]로 추출한다."""
+    return list(_iter_pdf_pages(data))
+
+
+def _iter_pdf_range(pdf: bytes | str, start: int, end: int) -> Iterator[tuple[int, str]]:
+    """[start, end) 페이지를 추출한다. pdf는 파일 바이트 또는 파일 경로."""
+    import io
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+    for index in range(start, end):
+        text = reader.pages[index].extract_text()
+        if text:
+            yield index + 1, text
+
+
+def _pdf_page_range(path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """[start, end) 페이지의 텍스트. 프로세스 풀 워커에서 실행되므로 모듈 최상위에 둔다.
+
+    워커는 부모가 써 둔 임시 파일을 직접 열어, 필요한 페이지만 파싱한다.
+    """
+    return list(_iter_pdf_range(path, start, end))
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _pdf_workers() -> int:
+    return int(os.getenv("PDF_MAX_PROCESSES", str(os.cpu_count() or 1)))
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """PDF 추출용 프로세스 풀 (처음 필요할 때 한 번만 만든다).
+
+    Streamlit 서버는 멀티스레드라 fork하면 다른 스레드가 잡고 있던 락이 자식에 복사돼
+    교착될 수 있으므로 spawn으로 띄운다. 워커는 이 모듈을 새로 import해 쓴다.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _reset_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
 
-def _read_docx(data: bytes) -> str:
+
+def _iter_docx(source: str, data: bytes) -> Iterator[ExtractRecord]:
     try:
         import io
         from docx import Document
         doc = Document(io.BytesIO(data))
-        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+    except ImportError:
+        yield ExtractRecord(source, "error", "[Word 읽기 실패: python-docx 패키지가 필요합니다. pip install python-docx]")
+        return
+    except Exception as e:
+        yield ExtractRecord(source, "error", f"[Word 읽기 오류: {e}]")
+        return
+
+    # 문단/표 접근도 지연 파싱이라 손상된 본문은 여기서 실패한다 (기존 _read_docx처럼 오류 레코드로)
+    try:
+        for p in doc.paragraphs:
+            if p.text.strip():
+                yield ExtractRecord(source, "paragraph", p.text)
         # 테이블도 추출
         for table in doc.tables:
-            for row in table.rows:
-                cells = [cell.text.strip() for cell in row.cells]
-                paragraphs.append(" | ".join(cells))
-        return "\n".join(paragraphs)
-    except ImportError:
-        return "[Word 읽기 실패: python-docx 패키지가 필요합니다. pip install python-docx]"
+            rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+            if rows:
+                yield ExtractRecord(source, "table", "\n".join(rows), row_start=1, row_end=len(rows))
     except Exception as e:
-        return f"[Word 읽기 오류: {e}]"
+        yield ExtractRecord(source, "error", f"[Word 읽기 오류: {e}]")
 
 
-def _read_excel(data: bytes) -> str:
+def _iter_excel(source: str, data: bytes) -> Iterator[ExtractRecord]:
     try:
         import io
         import openpyxl
         wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
-        parts = []
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            parts.append(f"[Sheet: {sheet_name}]")
-            for row in ws.iter_rows(values_only=True):
-                cells = [str(c) if c is not None else "" for c in row]
-                if any(cells):
-                    parts.append(" | ".join(cells))
-        wb.close()
-        return "\n".join(parts)
     except ImportError:
-        return "[Excel 읽기 실패: openpyxl 패키지가 필요합니다. pip install openpyxl]"
+        yield ExtractRecord(source, "error", "[Excel 읽기 실패: openpyxl 패키지가 필요합니다. pip install openpyxl]")
+        return
     except Exception as e:
-        return f"[Excel 읽기 오류: {e}]"
+        yield ExtractRecord(source, "error", f"[Excel 읽기 오류: {e}]")
+        return
+
+    try:
+        for sheet_name in wb.sheetnames:
+            yield ExtractRecord(source, "sheet", f"[Sheet: {sheet_name}]", sheet=sheet_name)
+            rows = (
+                [str(c) if c is not None else "" for c in row]
+                for row in wb[sheet_name].iter_rows(values_only=True)
+            )
+            yield from _row_records(source, rows, sheet=sheet_name)
+    except Exception as e:
+        yield ExtractRecord(source, "error", f"[Excel 읽기 오류: {e}]")
+    finally:
+        wb.close()
+
+
+def _iter_csv(source: str, data: bytes) -> Iterator[ExtractRecord]:
+    # CSV는 원문 줄을 그대로 유지한다 (셀 분리는 표 추출 단계에서)
+    lines = data.decode("utf-8", errors="replace").split("\n")
+    yield from _row_records(source, ([line] for line in lines), keep_empty=True)
+
+
+def _row_records(source: str, rows, sheet: str | None = None, keep_empty: bool = False) -> Iterator[ExtractRecord]:
+    """행(셀 문자열 리스트) 이터레이터를 ROWS_PER_RECORD 행씩 묶어 내보낸다.
+
+    비어 있는 행은 건너뛰고(keep_empty=False), EXTRACT_MAX_ROWS를 넘으면 안내
+    레코드를 내고 나머지 행은 읽지 않는다.
+    """
+    max_rows = row_limit()
+    buf = []
+    start = None
+    count = 0
+    last = 0
+    for number, cells in enumerate(rows, start=1):
+        if not keep_empty and not any(cells):
+            continue
+        if count >= max_rows:
+            if buf:
+                yield ExtractRecord(source, "rows", "\n".join(buf), sheet=sheet, row_start=start, row_end=last)
+                buf = []
+            yield ExtractRecord(source, "notice", row_limit_notice(max_rows, number), sheet=sheet, row_start=number)
+            return
+        if not buf:
+            start = number
+        buf.append(" | ".join(cells))
+        count += 1
+        last = number
+        if len(buf) >= ROWS_PER_RECORD:
+            yield ExtractRecord(source, "rows", "\n".join(buf), sheet=sheet, row_start=start, row_end=last)
+            buf = []
+    if buf:
+        yield ExtractRecord(source, "rows", "\n".join(buf), sheet=sheet, row_start=start, row_end=last)
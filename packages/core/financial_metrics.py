@@ -0,0 +1,256 @@
+"""재무 지표 엔진 — 업로드 표에서 성장률/마진/운전자본/비용 구조/CAGR을 계산한다.
+
+table_reader가 만든 Table 중 연도 열(또는 연도 행)을 가진 재무제표 표를 찾아
+계정 과목을 표준 항목(ITEM_ALIASES)으로 매핑하고, 항목 × 기간 행렬에서
+NumPy로 한 번에 계산한다. 표마다 단위(천원/백만원 등)가 다르면 처음 단위
+표기를 기준으로 환산해 합치고, 결과의 unit에 기준 단위와 환산 내역을 남긴다.
+FinanceCost 에이전트는 수천 행의 원본 대신 이 지표 표를 받으므로 프롬프트가
+짧아지고 숫자는 재현 가능하다.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# 표준 항목 → 계정 과목 별칭 (공백/기호 제거 후 소문자로 정확히 일치)
+ITEM_ALIASES = {
+    "revenue": ["매출액", "매출", "영업수익", "수익(매출액)", "매출합계", "revenue", "sales", "netsales"],
+    "cogs": ["매출원가", "costofsales", "cogs"],
+    "gross_profit": ["매출총이익", "grossprofit"],
+    "sga": ["판매비와관리비", "판매비및관리비", "판관비", "sg&a", "sga"],
+    "operating_income": ["영업이익", "영업이익(손실)", "operatingincome", "operatingprofit"],
+    "ebitda": ["ebitda"],
+    "net_income": ["당기순이익", "당기순이익(손실)", "순이익", "netincome", "netprofit"],
+    "depreciation": ["감가상각비", "유무형자산상각비", "depreciation", "d&a"],
+    "labor": ["인건비", "급여", "종업원급여", "salaries", "labor"],
+    "rent": ["임차료", "지급임차료", "rent"],
+    "advertising": ["광고선전비", "advertising"],
+    "commission": ["지급수수료", "fees"],
+    "rnd": ["경상연구개발비", "연구개발비", "r&d"],
+    "receivables": ["매출채권", "매출채권및기타채권", "receivables", "accountsreceivable"],
+    "inventory": ["재고자산", "inventory", "inventories"],
+    "payables": ["매입채무", "매입채무및기타채무", "payables", "accountspayable"],
+    "current_assets": ["유동자산", "currentassets"],
+    "current_liabilities": ["유동부채", "currentliabilities"],
+    "total_assets": ["자산총계", "totalassets"],
+    "total_liabilities": ["부채총계", "totalliabilities"],
+    "equity": ["자본총계", "totalequity", "equity"],
+    "debt": ["차입금", "총차입금", "단기차입금", "borrowings", "debt"],
+}
+
+ITEM_LABELS = {
+    "revenue": "매출액", "cogs": "매출원가", "sga": "판매비와관리비",
+    "operating_income": "영업이익", "net_income": "당기순이익", "ebitda": "EBITDA",
+    "depreciation": "감가상각비", "labor": "인건비", "rent": "임차료",
+    "advertising": "광고선전비", "commission": "지급수수료", "rnd": "연구개발비",
+}
+
+# 매출 대비 비율로 비용 구조를 보는 항목
+COST_ITEMS = ["cogs", "sga", "labor", "depreciation", "rent", "advertising", "commission", "rnd"]
+
+_ALIAS_INDEX = {alias: item for item, aliases in ITEM_ALIASES.items() for alias in aliases}
+_YEAR = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+# "(단위: 백만원)", "단위 : 천 원" 같은 표 단위 표기 → 원 기준 배수
+_UNIT = re.compile(r"단위\s*[:：]?\s*(천|백만|십억|억|조)?\s*원")
+_UNIT_SCALES = {"": 1.0, "천": 1e3, "백만": 1e6, "억": 1e8, "십억": 1e9, "조": 1e12}
+# "Ⅰ.", "1.", "(1)", "가.", "-" 같은 계정 번호/기호 (소문자화 후 기준)
+_LABEL_PREFIX = re.compile(r"^(?:(?:[ⅰ-ⅻ]+|[ivx]+|\d+|[가-하])[.)]|\(\d+\)|[-·•※])+")
+
+
+@dataclass
+class FinancialMetrics:
+    """기간별 지표 표. values는 지표 × 기간 행렬 (NaN = 산출 불가)."""
+    periods: list[int]
+    labels: list[str] = field(default_factory=list)
+    kinds: list[str] = field(default_factory=list)  # "amount" | "ratio" | "days" | "multiple"
+    values: np.ndarray = field(default_factory=lambda: np.empty((0, 0)))
+    cagr: list[tuple[str, int, int, float]] = field(default_factory=list)
+    unit: str = ""
+
+    def to_markdown(self) -> str:
+        head = "| 지표 | " + " | ".join(str(p) for p in self.periods) + " |"
+        lines = [head, "|" + "------|" * (len(self.periods) + 1)]
+        for label, kind, row in zip(self.labels, self.kinds, self.values):
+            if np.isnan(row).all():
+                continue
+            lines.append(f"| {label} | " + " | ".join(_fmt(v, kind) for v in row) + " |")
+        text = "\n".join(lines)
+        if self.cagr:
+            text += "\n\n" + "\n".join(
+                f"- {label} CAGR ({start}–{end}): {_fmt(rate, 'ratio')}" for label, start, end, rate in self.cagr
+            )
+        if self.unit:
+            text = f"{self.unit}\n{text}"
+        return text
+
+
+def _fmt(value: float, kind: str) -> str:
+    if np.isnan(value):
+        return "-"
+    if kind == "ratio":
+        return f"{value * 100:.1f}%"
+    if kind == "days":
+        return f"{value:.0f}일"
+    if kind == "multiple":
+        return f"{value:.2f}x"
+    return f"{value:,.0f}"
+
+
+def _normalize(label) -> str:
+    text = re.sub(r"\s+", "", str(label)).lower()
+    return _LABEL_PREFIX.sub("", text)
+
+
+def _year(value) -> int | None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and 1900 <= value <= 2100 and value == int(value):
+        return int(value)
+    match = _YEAR.search(str(value)) if isinstance(value, str) else None
+    return int(match.group(1)) if match else None
+
+
+def _series(table) -> dict[str, dict[int, float]]:
+    """표 하나에서 {표준 항목: {연도: 값}}을 뽑는다. 연도가 열이든 행이든 처리한다."""
+    found = {}
+    year_cols = {i: y for i, c in enumerate(table.columns) if (y := _year(c)) is not None}
+    if len(year_cols) >= 2:
+        # 계정 과목이 행, 연도가 열
+        for row in table.rows:
+            item = next((_ALIAS_INDEX.get(_normalize(v)) for v in row if isinstance(v, str) and _ALIAS_INDEX.get(_normalize(v))), None)
+            if item and item not in found:
+                found[item] = {y: float(row[i]) for i, y in year_cols.items() if isinstance(row[i], (int, float))}
+        return found
+
+    # 연도가 행, 계정 과목이 열
+    item_cols = {i: item for i, c in enumerate(table.columns) if (item := _ALIAS_INDEX.get(_normalize(c)))}
+    if not item_cols:
+        return found
+    for row in table.rows:
+        year = next((y for v in row[:2] if (y := _year(v)) is not None), None)
+        if year is None:
+            continue
+        for i, item in item_cols.items():
+            if isinstance(row[i], (int, float)):
+                found.setdefault(item, {}).setdefault(year, float(row[i]))
+    return found
+
+
+def _unit(table) -> str | None:
+    """표 제목 행의 단위 표기에서 접두어("천", "백만", …, 원이면 "")를 찾는다. 표기가 없으면 None."""
+    for title in table.titles:
+        match = _UNIT.search(title)
+        if match:
+            return match.group(1) or ""
+    return None
+
+
+def _divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a / b
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def compute_metrics(tables) -> FinancialMetrics | None:
+    """업로드 표 목록에서 재무 지표를 계산한다. 재무제표 표가 없으면 None."""
+    found = [(f, _unit(table)) for table in tables if (f := _series(table))]
+    # 단위가 다른 표(천원 vs 백만원)는 처음 단위 표기가 있는 표 기준으로 환산해 합친다.
+    # 단위 표기가 없는 표는 배수를 알 수 없으므로 모든 표가 표기 없을 때만 쓴다.
+    declared = [u for _, u in found if u is not None]
+    base = declared[0] if declared else None
+    series = {}
+    converted, skipped = set(), 0
+    for values_by_item, unit in found:
+        if unit is None and base is not None:
+            skipped += 1
+            continue
+        scale = _UNIT_SCALES[unit] / _UNIT_SCALES[base] if base is not None else 1.0
+        if scale != 1.0:
+            converted.add(unit)
+        for item, values in values_by_item.items():
+            series.setdefault(item, {})
+            for year, value in values.items():
+                series[item].setdefault(year, value * scale)
+    if "revenue" not in series or len(series["revenue"]) < 2:
+        return None
+
+    periods = sorted({y for values in series.values() for y in values})
+    items = list(ITEM_ALIASES)
+    matrix = np.full((len(items), len(periods)), np.nan)
+    col = {p: j for j, p in enumerate(periods)}
+    for i, item in enumerate(items):
+        for year, value in series.get(item, {}).items():
+            matrix[i, col[year]] = value
+    v = dict(zip(items, matrix))
+
+    # 파생 항목: 매출총이익/EBITDA가 없으면 계산
+    if np.isnan(v["gross_profit"]).all():
+        v["gross_profit"] = v["revenue"] - v["cogs"]
+    if np.isnan(v["ebitda"]).all():
+        v["ebitda"] = v["operating_income"] + v["depreciation"]
+
+    revenue = v["revenue"]
+    rows = []
+
+    def add(label, kind, values):
+        rows.append((label, kind, values))
+
+    def growth(x):
+        return np.concatenate([[np.nan], _divide(x[1:], x[:-1]) - 1])
+
+    add("매출액", "amount", revenue)
+    add("매출 성장률", "ratio", growth(revenue))
+    add("영업이익", "amount", v["operating_income"])
+    add("영업이익 성장률", "ratio", growth(v["operating_income"]))
+    add("매출총이익률", "ratio", _divide(v["gross_profit"], revenue))
+    add("EBITDA 마진", "ratio", _divide(v["ebitda"], revenue))
+    add("영업이익률", "ratio", _divide(v["operating_income"], revenue))
+    add("순이익률", "ratio", _divide(v["net_income"], revenue))
+
+    # 운전자본
+    dso = _divide(v["receivables"], revenue) * 365
+    dio = _divide(v["inventory"], v["cogs"]) * 365
+    dpo = _divide(v["payables"], v["cogs"]) * 365
+    add("매출채권회전일수(DSO)", "days", dso)
+    add("재고자산회전일수(DIO)", "days", dio)
+    add("매입채무회전일수(DPO)", "days", dpo)
+    add("현금전환주기(CCC)", "days", dso + dio - dpo)
+    add("순운전자본/매출", "ratio", _divide(v["receivables"] + v["inventory"] - v["payables"], revenue))
+    add("유동비율", "multiple", _divide(v["current_assets"], v["current_liabilities"]))
+    add("부채비율", "ratio", _divide(v["total_liabilities"], v["equity"]))
+    add("차입금/EBITDA", "multiple", _divide(v["debt"], v["ebitda"]))
+
+    # 비용 구조 (매출 대비)
+    for item in COST_ITEMS:
+        add(f"{ITEM_LABELS[item]}/매출", "ratio", _divide(v[item], revenue))
+
+    # CAGR: 처음과 마지막 유효 기간 사이
+    years = np.array(periods, dtype=float)
+    cagr = []
+    for item in ("revenue", "operating_income", "net_income", "ebitda"):
+        valid = np.flatnonzero(~np.isnan(v[item]))
+        if len(valid) < 2:
+            continue
+        first, last = valid[0], valid[-1]
+        start, end = v[item][first], v[item][last]
+        if start <= 0 or end <= 0:
+            continue
+        rate = (end / start) ** (1 / (years[last] - years[first])) - 1
+        cagr.append((ITEM_LABELS[item], periods[first], periods[last], float(rate)))
+
+    notes = [f"{u or ''}원 표를 환산" for u in sorted(converted, key=_UNIT_SCALES.get)]
+    if skipped:
+        notes.append(f"단위 표기 없는 표 {skipped}개 제외")
+    unit = f"(단위: {base}원)" if base is not None else ""
+    if notes:
+        unit += (" " if unit else "") + f"[{', '.join(notes)}]"
+
+    return FinancialMetrics(
+        periods=periods,
+        labels=[r[0] for r in rows],
+        kinds=[r[1] for r in rows],
+        values=np.vstack([r[2] for r in rows]),
+        cagr=cagr,
+        unit=unit,
+    )
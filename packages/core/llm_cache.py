@@ -0,0 +1,151 @@
+"""LLM 응답 캐시 — SQLite 기반 content-addressed 저장소.
+
+키는 (model, messages, temperature, max_tokens)의 SHA-256 해시이며,
+TTL이 지난 항목은 조회 시 무시되고 전체 크기가 한도를 넘으면
+가장 오래전에 사용된 항목부터(LRU) 삭제한다.
+
+환경변수:
+  - LLM_CACHE_ENABLED : 0이면 캐시 비활성화 (기본 1)
+  - LLM_CACHE_PATH    : SQLite 파일 경로 (기본 data/llm_cache/llm_cache.sqlite3)
+  - LLM_CACHE_TTL     : 항목 유효 시간(초, 기본 7일. 0이면 만료 없음)
+  - LLM_CACHE_MAX_MB  : 캐시 최대 크기(MB, 기본 256)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from pathlib import Path
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "llm_cache" / "llm_cache.sqlite3"
+
+_cache = None
+_cache_config = None
+_cache_lock = threading.Lock()
+_config_warned = False
+
+
+def make_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    """요청 내용으로 캐시 키(SHA-256 hex)를 만든다."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """스레드 안전한 SQLite 응답 캐시."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        """키에 해당하는 응답을 반환한다. 없거나 만료됐으면 None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        """응답을 저장하고 필요하면 LRU 정리를 수행한다."""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 한도의 90%까지 오래 안 쓴 항목부터 삭제
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "path": self.path}
+
+
+def get_cache() -> ResponseCache | None:
+    """env 설정에 맞는 캐시 인스턴스를 반환한다. 비활성화 상태면 None."""
+    global _cache, _cache_config, _config_warned
+    if os.getenv("LLM_CACHE_ENABLED", "1") in ("0", "false", "False", ""):
+        return None
+    try:
+        config = (
+            os.getenv("LLM_CACHE_PATH", str(_DEFAULT_PATH)),
+            float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+        )
+    except ValueError as e:
+        # 캐시는 best-effort: 설정이 잘못돼도 LLM 호출은 캐시 없이 계속된다
+        if not _config_warned:
+            _config_warned = True
+            warnings.warn(f"LLM 캐시 설정(LLM_CACHE_TTL/LLM_CACHE_MAX_MB) 오류로 캐시를 끕니다: {e}", RuntimeWarning)
+        return None
+    with _cache_lock:
+        if _cache is None or config != _cache_config:
+            try:
+                _cache = ResponseCache(*config)
+            except (OSError, sqlite3.Error):
+                # 캐시 파일을 열 수 없어도 LLM 호출 자체는 계속 동작해야 한다
+                _cache = None
+            _cache_config = config
+    return _cache
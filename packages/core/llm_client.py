@@ -10,28 +10,30 @@
   - 기타 OpenAI-compatible 엔드포인트
 
 모든 프로바이더는 OpenAI SDK의 base_url 파라미터로 연결됩니다.
+LLM_BASE_URL에 쉼표로 여러 엔드포인트를 주면 llm_endpoints가 부하 분산/장애 조치를 한다.
+동일한 요청의 응답은 llm_cache(SQLite)에 저장되어 재사용되고,
+모든 호출은 llm_scheduler의 모델별 RPM/TPM 예산과 재시도 정책을 거칩니다.
+같은 요청이 동시에 여러 번 들어오면(더블 클릭, 여러 탭) 업스트림 호출 하나를
+공유한다(single-flight).
 """
 
+import asyncio
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import Future
 
-load_dotenv()
+from dotenv import load_dotenv
 
-_client = None
-_client_config = ("", "")
+from packages.core.llm_cache import get_cache, make_key
+from packages.core.llm_endpoints import get_pool, is_endpoint_failure
+from packages.core.llm_scheduler import estimate_request_tokens, scheduler
+from packages.core.model_router import current_route, resolve_route
 
+load_dotenv()
 
-def _get_client() -> OpenAI:
-    """설정이 바뀌면 클라이언트를 재생성한다."""
-    global _client, _client_config
-    api_key = os.getenv("LLM_API_KEY", os.getenv("OPENAI_API_KEY", "ollama"))
-    base_url = os.getenv("LLM_BASE_URL", os.getenv("OPENAI_API_BASE_URL", "http://localhost:11434/v1"))
-    current_config = (api_key, base_url)
-    if _client is None or current_config != _client_config:
-        _client = OpenAI(api_key=api_key, base_url=base_url)
-        _client_config = current_config
-    return _client
+# 진행 중인 요청: fingerprint -> Future (동기/비동기 호출자가 함께 기다린다)
+_inflight = {}
+_inflight_lock = threading.Lock()
 
 
 def get_model() -> str:
@@ -39,36 +41,341 @@ def get_model() -> str:
     return os.getenv("LLM_MODEL", os.getenv("OPENAI_MODEL", "gpt-4"))
 
 
-def generate_text(system_prompt: str, user_prompt: str) -> str:
-    """LLM chat completion 호출. 실패 시 사용자 친화적 메시지를 반환한다."""
-    model = get_model()
+def _text_messages(system_prompt: str, user_prompt: str) -> list:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _request_params(messages: list) -> dict:
+    """현재 라우트(model_router.routed 블록)에 맞는 요청 파라미터를 만든다."""
+    route = current_route() or resolve_route()
+    return {
+        "model": route["model"],
+        "messages": messages,
+        "temperature": route["temperature"],
+        "max_tokens": route["max_tokens"],
+    }
+
+
+def _create(params: dict, **extra):
+    """스케줄러 예산을 확보한 뒤 chat completion을 호출한다.
+
+    엔드포인트 장애는 다른 엔드포인트로 즉시 넘기고, 모두 실패하면
+    스케줄러가 백오프 후 재시도한다.
+    """
+    est_tokens = estimate_request_tokens(params["messages"], params["max_tokens"])
+    return scheduler.run(params["model"], est_tokens, lambda: _create_once(params, **extra))
+
+
+def _create_once(params: dict, **extra):
+    pool = get_pool()
+    tried = set()
+    while True:
+        endpoint = pool.acquire(exclude=tried)
+        try:
+            resp = endpoint.client().chat.completions.create(**params, **extra)
+        except Exception as e:
+            failed = is_endpoint_failure(e)
+            pool.release(endpoint, ok=not failed)
+            tried.add(endpoint)
+            if failed and pool.has_alternative(tried):
+                continue
+            raise
+        if extra.get("stream"):
+            # 스트림은 끝까지 소비된 뒤에 outstanding을 반환한다
+            return _release_after_stream(resp, pool, endpoint)
+        pool.release(endpoint, ok=True)
+        return resp
+
+
+def _release_after_stream(stream, pool, endpoint):
+    ok = True
     try:
-        client = _get_client()
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,
-            max_tokens=4096,
-        )
-        return resp.choices[0].message.content.strip()
+        for event in stream:
+            yield event
     except Exception as e:
-        return f"[LLM 호출 오류] {e}"
+        ok = not is_endpoint_failure(e)
+        raise
+    finally:
+        stream.close()
+        pool.release(endpoint, ok)
+
+
+async def _acreate(params: dict, **extra):
+    est_tokens = estimate_request_tokens(params["messages"], params["max_tokens"])
+    return await scheduler.arun(params["model"], est_tokens, lambda: _acreate_once(params, **extra))
+
+
+async def _acreate_once(params: dict, **extra):
+    pool = get_pool()
+    tried = set()
+    while True:
+        endpoint = pool.acquire(exclude=tried)
+        try:
+            resp = await endpoint.async_client().chat.completions.create(**params, **extra)
+        except Exception as e:
+            failed = is_endpoint_failure(e)
+            pool.release(endpoint, ok=not failed)
+            tried.add(endpoint)
+            if failed and pool.has_alternative(tried):
+                continue
+            raise
+        if extra.get("stream"):
+            return _arelease_after_stream(resp, pool, endpoint)
+        pool.release(endpoint, ok=True)
+        return resp
+
+
+async def _arelease_after_stream(stream, pool, endpoint):
+    ok = True
+    try:
+        async for event in stream:
+            yield event
+    except Exception as e:
+        ok = not is_endpoint_failure(e)
+        raise
+    finally:
+        await stream.close()
+        pool.release(endpoint, ok)
+
+
+def get_endpoint_stats() -> list[dict]:
+    """엔드포인트별 진행 중 요청 수, 오류 수, 상태를 반환한다."""
+    return get_pool().stats()
+
+
+def get_scheduler_stats() -> dict:
+    """모델별 대기열 깊이/대기 시간 통계를 반환한다."""
+    return scheduler.stats()
+
+
+def warm_up(timeout: float = 10.0) -> list[dict]:
+    """모든 엔드포인트에 커넥션을 미리 연다 (첫 호출의 TLS 핸드셰이크 비용 제거).
+
+    Returns:
+        [{"base_url", "connected", "seconds", "error"}]
+    """
+    return get_pool().warm_up(timeout)
+
+
+def _cache_lookup(params: dict, use_cache: bool):
+    """(cache, key, cached_text)를 반환한다. 캐시를 쓰지 않으면 (None, None, None)."""
+    if not use_cache:
+        return None, None, None
+    try:
+        cache = get_cache()
+        if cache is None:
+            return None, None, None
+        key = _fingerprint(params)
+        return cache, key, cache.get(key)
+    except Exception:
+        return None, None, None
+
+
+async def _acache_lookup(params: dict, use_cache: bool):
+    """_cache_lookup의 asyncio 버전. SQLite 조회가 이벤트 루프를 막지 않도록 스레드에서 한다."""
+    if not use_cache:
+        return None, None, None
+    return await asyncio.to_thread(_cache_lookup, params, use_cache)
+
+
+def _cache_store(cache, key, text: str):
+    if cache is None:
+        return
+    try:
+        cache.set(key, text)
+    except Exception:
+        pass
+
+
+async def _acache_store(cache, key, text: str):
+    if cache is None:
+        return
+    await asyncio.to_thread(_cache_store, cache, key, text)
+
+
+class _LeaderAbandoned(Exception):
+    """leader가 취소/중단돼 결과 없이 끝났다. 기다리던 호출자는 직접 다시 시도한다."""
 
 
-def generate_chat(messages: list) -> str:
+def _join_or_lead(key: str) -> tuple[Future, bool]:
+    """진행 중인 동일 요청이 있으면 그 Future를, 없으면 새 Future와 leader=True를 반환한다."""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        if call is not None:
+            return call, False
+        call = _inflight[key] = Future()
+        # 실행 중 상태로 두어 follower 쪽 취소(wrap_future 취소 전파)가 공유 Future를 취소하지 못하게 한다
+        call.set_running_or_notify_cancel()
+        return call, True
+
+
+def _finish(key: str, call: Future, text: str = None, error: BaseException = None):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        call.set_exception(error)
+    else:
+        call.set_result(text)
+
+
+def _fetch(params: dict, cache, cache_key) -> str:
+    """동일 fingerprint의 동시 호출을 하나로 합쳐 응답 텍스트를 가져온다."""
+    key = _fingerprint(params)
+    while True:
+        call, leader = _join_or_lead(key)
+        if leader:
+            break
+        try:
+            return call.result()
+        except _LeaderAbandoned:
+            # leader가 취소됐으면 그 취소를 물려받지 않고 새로 시도한다 (다음 호출자가 leader가 된다)
+            continue
+    try:
+        resp = _create(params)
+        text = resp.choices[0].message.content.strip()
+    except Exception as e:
+        _finish(key, call, error=e)
+        raise
+    except BaseException:
+        # KeyboardInterrupt/CancelledError 등은 leader 자신의 사정이므로 follower에게 넘기지 않는다
+        _finish(key, call, error=_LeaderAbandoned())
+        raise
+    _cache_store(cache, cache_key, text)
+    _finish(key, call, text)
+    return text
+
+
+async def _afetch(params: dict, cache, cache_key) -> str:
+    key = _fingerprint(params)
+    while True:
+        call, leader = _join_or_lead(key)
+        if leader:
+            break
+        try:
+            return await asyncio.wrap_future(call)
+        except _LeaderAbandoned:
+            continue
+    try:
+        resp = await _acreate(params)
+        text = resp.choices[0].message.content.strip()
+    except Exception as e:
+        _finish(key, call, error=e)
+        raise
+    except BaseException:
+        _finish(key, call, error=_LeaderAbandoned())
+        raise
+    await _acache_store(cache, cache_key, text)
+    _finish(key, call, text)
+    return text
+
+
+def _fingerprint(params: dict) -> str:
+    return make_key(params["model"], params["messages"], params["temperature"], params["max_tokens"])
+
+
+def generate_text(system_prompt: str, user_prompt: str, use_cache: bool = True) -> str:
+    """LLM chat completion 호출. 실패 시 사용자 친화적 메시지를 반환한다.
+
+    use_cache=False면 캐시를 건너뛰고 항상 새로 생성한다.
+    """
+    return generate_chat(_text_messages(system_prompt, user_prompt), use_cache=use_cache)
+
+
+def generate_chat(messages: list, use_cache: bool = True) -> str:
     """메시지 리스트를 직접 받아 LLM chat completion 호출. 대화 히스토리 지원."""
-    model = get_model()
+    params = _request_params(messages)
+    cache, key, cached = _cache_lookup(params, use_cache)
+    if cached is not None:
+        return cached
     try:
-        client = _get_client()
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.3,
-            max_tokens=4096,
-        )
-        return resp.choices[0].message.content.strip()
+        return _fetch(params, cache, key)
     except Exception as e:
         return f"[LLM 호출 오류] {e}"
+
+
+async def agenerate_text(system_prompt: str, user_prompt: str, use_cache: bool = True) -> str:
+    """generate_text의 asyncio 버전."""
+    return await agenerate_chat(_text_messages(system_prompt, user_prompt), use_cache=use_cache)
+
+
+async def agenerate_chat(messages: list, use_cache: bool = True) -> str:
+    """generate_chat의 asyncio 버전. 루프 단위로 풀링된 커넥션을 사용한다."""
+    params = _request_params(messages)
+    cache, key, cached = await _acache_lookup(params, use_cache)
+    if cached is not None:
+        return cached
+    try:
+        return await _afetch(params, cache, key)
+    except Exception as e:
+        return f"[LLM 호출 오류] {e}"
+
+
+def stream_text(system_prompt: str, user_prompt: str, use_cache: bool = True):
+    """generate_text의 스트리밍 버전. 생성되는 텍스트 조각(delta)을 순서대로 yield한다."""
+    return stream_chat(_text_messages(system_prompt, user_prompt), use_cache=use_cache)
+
+
+def stream_chat(messages: list, use_cache: bool = True):
+    """generate_chat의 스트리밍 버전.
+
+    요청 파라미터(라우트 포함)는 호출 시점에 확정되고, 반환된 generator를 소비할 때
+    실제 호출이 일어난다. 스트림은 호출자마다 따로 소비되므로 single-flight 대상이 아니다.
+    캐시 적중 시 저장된 응답을 한 번에 yield하고, 실패 시 오류 메시지를 yield한다.
+    스트림이 끝까지 소비되면 전체 응답을 캐시에 저장한다.
+    """
+    return _stream(_request_params(messages), use_cache)
+
+
+def _stream(params: dict, use_cache: bool):
+    cache, key, cached = _cache_lookup(params, use_cache)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    try:
+        stream = _create(params, stream=True)
+        for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield delta
+    except Exception as e:
+        yield f"[LLM 호출 오류] {e}"
+        return
+    _cache_store(cache, key, "".join(chunks).strip())
+
+
+def astream_text(system_prompt: str, user_prompt: str, use_cache: bool = True):
+    """stream_text의 asyncio 버전 (async generator를 반환)."""
+    return astream_chat(_text_messages(system_prompt, user_prompt), use_cache=use_cache)
+
+
+def astream_chat(messages: list, use_cache: bool = True):
+    """stream_chat의 asyncio 버전 (async generator를 반환)."""
+    return _astream(_request_params(messages), use_cache)
+
+
+async def _astream(params: dict, use_cache: bool):
+    cache, key, cached = await _acache_lookup(params, use_cache)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    try:
+        stream = await _acreate(params, stream=True)
+        async for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield delta
+    except Exception as e:
+        yield f"[LLM 호출 오류] {e}"
+        return
+    await _acache_store(cache, key, "".join(chunks).strip())
@@ -0,0 +1,259 @@
+"""LLM 엔드포인트 풀 — 여러 OpenAI-compatible 백엔드 간 부하 분산과 장애 조치.
+
+LLM_BASE_URL에 쉼표로 여러 엔드포인트를 지정하면 진행 중인 요청 수가 가장 적은
+엔드포인트로 라우팅한다 (least outstanding requests). 연속 실패가 임계치를 넘은
+엔드포인트는 일정 시간 제외(eject)되고, 쿨다운이 끝나면 요청 하나로 상태를
+확인(probe)해 성공하면 다시 풀에 넣는다.
+
+환경변수:
+  - LLM_BASE_URL               : 엔드포인트 목록. 예) http://gpu1:8000/v1,http://gpu2:8000/v1,https://api.openai.com/v1
+  - LLM_API_KEY                : 공통 키 또는 엔드포인트 순서대로 쉼표로 구분한 키 목록
+  - LLM_ENDPOINT_MAX_FAILURES  : 제외까지 허용하는 연속 실패 횟수 (기본 3)
+  - LLM_ENDPOINT_COOLDOWN      : 제외 후 재확인까지 대기 시간(초, 기본 30)
+  - LLM_MAX_CONNECTIONS / LLM_MAX_KEEPALIVE_CONNECTIONS / LLM_KEEPALIVE_EXPIRY
+                               : 엔드포인트별 커넥션 풀 한도
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+# openai/httpx는 import 비용이 커서(앱 콜드 스타트의 대부분) 클라이언트를 만들 때 로드한다
+
+
+def _http_limits() -> httpx.Limits:
+    """커넥션 풀/keep-alive 한도. LLM_MAX_CONNECTIONS 등 env로 조정한다."""
+    import httpx
+
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def is_endpoint_failure(error: Exception) -> bool:
+    """엔드포인트 자체의 장애로 볼 오류인지 (연결 실패, 타임아웃, 5xx)."""
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+class Endpoint:
+    """엔드포인트 하나와 전용 커넥션 풀, 상태 카운터."""
+
+    def __init__(self, base_url: str, api_key: str):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.requests = 0
+        self.errors = 0
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.retired = False
+
+    def client(self) -> OpenAI:
+        if self._client is None:
+            import httpx
+            from openai import OpenAI
+
+            self._client = OpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,  # 재시도는 llm_scheduler가 담당
+                http_client=httpx.Client(limits=_http_limits()),
+            )
+        return self._client
+
+    def async_client(self) -> AsyncOpenAI:
+        """현재 이벤트 루프에 묶인 AsyncOpenAI 클라이언트 (httpx 커넥션은 생성한 루프에 묶인다)."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=_http_limits()),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > 0
+
+    def close(self):
+        """커넥션 풀을 닫는다. 비동기 클라이언트는 각자의 이벤트 루프에서 닫는다 (닫힌 루프는 건너뜀)."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        for loop, client in list(self._async_clients.items()):
+            if not loop.is_closed():
+                try:
+                    loop.call_soon_threadsafe(lambda c=client: asyncio.ensure_future(c.close()))
+                except RuntimeError:
+                    pass
+        self._async_clients.clear()
+
+
+class EndpointPool:
+    """least-outstanding-requests 라우팅 + 실패 엔드포인트 제외/재투입."""
+
+    def __init__(self, endpoints: list[Endpoint]):
+        self.endpoints = endpoints
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude=()) -> Endpoint:
+        """요청을 보낼 엔드포인트를 고르고 outstanding을 증가시킨다."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep not in exclude] or self.endpoints
+            # 쿨다운이 끝난 제외 엔드포인트가 있으면 이번 요청으로 상태를 확인(probe)한다.
+            # probe가 실패해도 호출 측이 곧바로 다른 엔드포인트로 넘긴다.
+            ready = [ep for ep in candidates if ep.ejected and ep.ejected_until <= now and not ep.probing]
+            healthy = [ep for ep in candidates if not ep.ejected]
+            if ready:
+                chosen = min(ready, key=lambda ep: ep.ejected_until)
+                chosen.probing = True
+            elif healthy:
+                chosen = min(healthy, key=lambda ep: (ep.outstanding, ep.requests))
+            else:
+                # 모두 제외 상태면 가장 먼저 복귀 예정인 엔드포인트로 시도한다
+                chosen = min(candidates, key=lambda ep: ep.ejected_until)
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, endpoint: Endpoint, ok: bool):
+        """요청 결과를 반영한다. ok=False면 실패 카운트를 올리고 필요 시 제외한다."""
+        max_failures = int(os.getenv("LLM_ENDPOINT_MAX_FAILURES", "3"))
+        cooldown = float(os.getenv("LLM_ENDPOINT_COOLDOWN", "30"))
+        with self._lock:
+            endpoint.outstanding -= 1
+            if endpoint.retired and endpoint.outstanding == 0:
+                # 설정 변경으로 교체된 풀: 마지막 요청이 끝나면 커넥션을 닫는다
+                endpoint.close()
+            if ok:
+                endpoint.failures = 0
+                endpoint.ejected_until = 0.0
+                endpoint.probing = False
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.probing or endpoint.failures >= max_failures:
+                endpoint.ejected_until = time.monotonic() + cooldown
+                endpoint.probing = False
+
+    def close(self):
+        """풀을 폐기한다. 진행 중인 요청이 없는 엔드포인트는 바로, 나머지는 요청이 끝날 때 닫는다."""
+        with self._lock:
+            for ep in self.endpoints:
+                ep.retired = True
+                if ep.outstanding == 0:
+                    ep.close()
+
+    def has_alternative(self, tried) -> bool:
+        """아직 시도하지 않은 사용 가능한 엔드포인트가 있는지."""
+        now = time.monotonic()
+        with self._lock:
+            return any(
+                ep not in tried and (not ep.ejected or (ep.ejected_until <= now and not ep.probing))
+                for ep in self.endpoints
+            )
+
+    def warm_up(self, timeout: float = 10.0) -> list[dict]:
+        """엔드포인트마다 models.list를 한 번 호출해 DNS/TLS/커넥션 풀을 미리 연다.
+
+        상태 코드 오류(401/404 등)도 연결 자체는 된 것이므로 connected로 본다.
+        헬스 카운터(failures/ejected)는 건드리지 않는다.
+        """
+        def touch(ep: Endpoint) -> dict:
+            import openai
+
+            start = time.perf_counter()
+            try:
+                ep.client().with_options(timeout=timeout).models.list()
+                connected, error = True, None
+            except openai.APIStatusError as e:
+                connected, error = True, f"HTTP {e.status_code}"
+            except Exception as e:
+                connected, error = False, str(e)
+            return {
+                "base_url": ep.base_url,
+                "connected": connected,
+                "seconds": time.perf_counter() - start,
+                "error": error,
+            }
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.endpoints)), thread_name_prefix="llm-warmup") as pool:
+            return list(pool.map(touch, self.endpoints))
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "base_url": ep.base_url,
+                    "outstanding": ep.outstanding,
+                    "requests": ep.requests,
+                    "errors": ep.errors,
+                    "healthy": not ep.ejected,
+                    "ejected_for": max(0.0, ep.ejected_until - now) if ep.ejected else 0.0,
+                }
+                for ep in self.endpoints
+            ]
+
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+
+
+def _current_config() -> tuple[str, str]:
+    api_key = os.getenv("LLM_API_KEY", os.getenv("OPENAI_API_KEY", "ollama"))
+    base_url = os.getenv("LLM_BASE_URL", os.getenv("OPENAI_API_BASE_URL", "http://localhost:11434/v1"))
+    return api_key, base_url
+
+
+def get_pool() -> EndpointPool:
+    """설정이 바뀌면 엔드포인트 풀을 재구성한다."""
+    global _pool, _pool_config
+    config = _current_config()
+    with _pool_lock:
+        if _pool is None or config != _pool_config:
+            api_key, base_url = config
+            urls = [u.strip() for u in base_url.split(",") if u.strip()]
+            keys = [k.strip() for k in api_key.split(",")]
+            if len(keys) == 1:
+                keys = keys * len(urls)
+            elif len(keys) != len(urls):
+                # 쉼표로 이어진 키 문자열을 그대로 보내면 모든 요청이 이유 없이 인증 실패한다
+                raise ValueError(
+                    f"LLM_API_KEY 설정 오류: 키 {len(keys)}개, 엔드포인트 {len(urls)}개. "
+                    "키는 하나(공통)이거나 LLM_BASE_URL과 같은 개수여야 합니다."
+                )
+            if _pool is not None:
+                _pool.close()
+            _pool = EndpointPool([Endpoint(url, key) for url, key in zip(urls, keys)])
+            _pool_config = config
+        return _pool
@@ -0,0 +1,290 @@
+"""LLM 요청 스케줄러 — 모델별 토큰 버킷과 재시도 정책.
+
+여러 애널리스트가 같은 API 키를 공유할 때 RPM/TPM 한도에 걸려 실패하는 대신
+호출자를 FIFO 대기열에 세우고, 버킷에 여유가 생기면 순서대로 통과시킨다.
+429/5xx/연결 오류는 Retry-After 헤더를 우선 따르고, 없으면 지터가 섞인
+지수 백오프로 재시도한다.
+
+환경변수:
+  - LLM_RPM_LIMIT         : 모델별 분당 요청 수 한도 (기본 0 = 무제한)
+  - LLM_TPM_LIMIT         : 모델별 분당 토큰 수 한도 (기본 0 = 무제한)
+  - LLM_RATE_LIMITS       : 모델별 개별 한도 JSON. 예) {"gpt-4o": {"rpm": 500, "tpm": 30000}}
+  - LLM_MAX_RETRIES       : 최대 재시도 횟수 (기본 5)
+  - LLM_RETRY_BASE_DELAY  : 백오프 기본 지연(초, 기본 1)
+  - LLM_RETRY_MAX_DELAY   : 백오프 최대 지연(초, 기본 60)
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# 재시도 대상 HTTP 상태 코드
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """문자 수 기반 토큰 추정치. 한글은 대략 글자당 1토큰, 영문은 4글자당 1토큰."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+
+def estimate_request_tokens(messages: list, max_tokens: int) -> int:
+    """요청 하나가 TPM 버킷에서 차지할 토큰 수 (입력 추정치 + 최대 출력)."""
+    prompt = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+    return prompt + max_tokens
+
+
+class TokenBucket:
+    """분당 한도를 초당 보충 속도로 환산한 토큰 버킷. limit=0이면 무제한."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.capacity <= 0:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount만큼 꺼내려면 기다려야 하는 시간(초)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.capacity > 0:
+            self.tokens -= min(amount, self.capacity)
+
+
+class _ModelState:
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.queue = deque()
+        self.blocked_until = 0.0
+        self.served = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+
+
+class RequestScheduler:
+    """프로세스 전역 요청 스케줄러. 동기/비동기 호출자를 같은 대기열에서 관리한다."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._models = {}
+        self._tickets = itertools.count()
+
+    # ── 한도 설정 ──
+
+    def _limits_for(self, model: str) -> tuple[float, float]:
+        rpm = float(os.getenv("LLM_RPM_LIMIT", "0"))
+        tpm = float(os.getenv("LLM_TPM_LIMIT", "0"))
+        try:
+            overrides = json.loads(os.getenv("LLM_RATE_LIMITS", "") or "{}")
+        except ValueError:
+            overrides = {}
+        model_limits = overrides.get(model, {})
+        return float(model_limits.get("rpm", rpm)), float(model_limits.get("tpm", tpm))
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = _ModelState(*self._limits_for(model))
+            self._models[model] = state
+        return state
+
+    # ── 대기열 ──
+
+    def _enqueue(self, model: str) -> int:
+        with self._cond:
+            ticket = next(self._tickets)
+            self._state(model).queue.append(ticket)
+            return ticket
+
+    def _try_acquire(self, model: str, ticket: int, est_tokens: int) -> float:
+        """통과하면 0, 아니면 다시 시도하기까지의 대기 시간을 반환한다. (락 보유 상태에서 호출)"""
+        state = self._state(model)
+        now = time.monotonic()
+        if state.queue[0] != ticket:
+            return 0.05
+        wait = max(
+            state.blocked_until - now,
+            state.requests.wait_time(1, now),
+            state.tokens.wait_time(est_tokens, now),
+        )
+        if wait > 0:
+            return wait
+        state.requests.consume(1)
+        state.tokens.consume(est_tokens)
+        state.queue.popleft()
+        self._cond.notify_all()
+        return 0.0
+
+    def _record_wait(self, model: str, waited: float):
+        state = self._state(model)
+        state.served += 1
+        state.total_wait += waited
+        state.max_wait = max(state.max_wait, waited)
+        if waited > 0.001:
+            state.throttled += 1
+
+    def _abandon(self, model: str, ticket: int):
+        state = self._state(model)
+        if ticket in state.queue:
+            state.queue.remove(ticket)
+            self._cond.notify_all()
+
+    def acquire(self, model: str, est_tokens: int) -> float:
+        """버킷에 여유가 생길 때까지 블로킹 대기한다. 대기한 시간(초)을 반환."""
+        started = time.monotonic()
+        ticket = self._enqueue(model)
+        with self._cond:
+            try:
+                while True:
+                    wait = self._try_acquire(model, ticket, est_tokens)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._abandon(model, ticket)
+                raise
+            waited = time.monotonic() - started
+            self._record_wait(model, waited)
+        return waited
+
+    async def aacquire(self, model: str, est_tokens: int) -> float:
+        """acquire의 asyncio 버전. 이벤트 루프를 막지 않고 대기한다."""
+        started = time.monotonic()
+        ticket = self._enqueue(model)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(model, ticket, est_tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            with self._cond:
+                self._abandon(model, ticket)
+            raise
+        waited = time.monotonic() - started
+        with self._cond:
+            self._record_wait(model, waited)
+        return waited
+
+    # ── 재시도 ──
+
+    def _retry_delay(self, model: str, error: Exception, attempt: int) -> float | None:
+        """재시도까지 기다릴 시간. 재시도 대상이 아니면 None."""
+        import openai  # 오류가 났을 때는 이미 로드되어 있다
+
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code not in _RETRYABLE_STATUS:
+                return None
+        elif not isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return None
+
+        delay = _retry_after(error)
+        if delay is None:
+            base = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+            cap = float(os.getenv("LLM_RETRY_MAX_DELAY", "60"))
+            # full jitter: [0, min(cap, base * 2^attempt)]
+            delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+
+        with self._cond:
+            state = self._state(model)
+            state.retries += 1
+            if isinstance(error, openai.APIStatusError) and error.status_code == 429:
+                # 같은 모델의 대기열 전체를 Retry-After 동안 멈춘다
+                state.rate_limited += 1
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+                self._cond.notify_all()
+        return delay
+
+    def run(self, model: str, est_tokens: int, fn):
+        """예산을 확보한 뒤 fn()을 호출하고, 일시적 오류는 재시도한다."""
+        max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        for attempt in itertools.count():
+            self.acquire(model, est_tokens)
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None or attempt >= max_retries:
+                    raise
+                time.sleep(delay)
+
+    async def arun(self, model: str, est_tokens: int, coro_fn):
+        """run의 asyncio 버전. coro_fn은 호출할 때마다 새 코루틴을 반환해야 한다."""
+        max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        for attempt in itertools.count():
+            await self.aacquire(model, est_tokens)
+            try:
+                return await coro_fn()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None or attempt >= max_retries:
+                    raise
+                await asyncio.sleep(delay)
+
+    # ── 통계 ──
+
+    def stats(self) -> dict:
+        """모델별 대기열 깊이와 대기 시간 통계."""
+        with self._cond:
+            return {
+                model: {
+                    "queue_depth": len(state.queue),
+                    "served": state.served,
+                    "throttled": state.throttled,
+                    "avg_wait": state.total_wait / state.served if state.served else 0.0,
+                    "max_wait": state.max_wait,
+                    "retries": state.retries,
+                    "rate_limited": state.rate_limited,
+                }
+                for model, state in self._models.items()
+            }
+
+
+def _retry_after(error: Exception) -> float | None:
+    """응답 헤더의 Retry-After(-ms)를 초 단위로 읽는다."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+scheduler = RequestScheduler()
@@ -0,0 +1,104 @@
+"""모델 라우팅 — 에이전트/보고서 모드별 model, max_tokens, temperature 선택.
+
+기계적인 에이전트(dd, competitor 등)는 작고 빠른 모델과 짧은 출력 예산으로,
+종합 요약과 최종 의견은 큰 모델로 보낸다. 라우팅은 with routed(...) 블록 안의
+모든 llm_client 호출에 적용된다 (contextvars 기반이라 스레드/코루틴별로 독립).
+
+해석 순서 (뒤가 우선):
+  default → agents[agent_key] → modes[mode]["*"] → modes[mode][agent_key]
+
+tier는 env로 실제 모델명에 매핑된다:
+  - LLM_MODEL_SMALL : small tier 모델 (없으면 LLM_MODEL)
+  - LLM_MODEL_LARGE : large tier 모델 (없으면 LLM_MODEL)
+  - LLM_ROUTING     : ROUTES와 같은 구조의 JSON. 기본 테이블에 덮어쓴다.
+    예) {"agents": {"industry": {"tier": "small"}}, "modes": {"IC Memo": {"*": {"max_tokens": 1536}}}}
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+from contextlib import contextmanager
+
+ROUTES = {
+    "default": {"tier": "large", "max_tokens": 4096, "temperature": 0.3},
+    "agents": {
+        # 체크리스트/표 위주의 기계적 에이전트
+        "dd": {"tier": "small", "max_tokens": 2048},
+        "competitor": {"tier": "small", "max_tokens": 2048},
+        "digest": {"tier": "small", "max_tokens": 2048, "temperature": 0.0},
+        # 판단이 필요한 최종 산출물
+        "summary": {"tier": "large", "max_tokens": 4096},
+        "final_opinion": {"tier": "large", "max_tokens": 4096},
+    },
+    "modes": {
+        "IC Memo": {
+            "*": {"max_tokens": 2048},
+            "summary": {"max_tokens": 3072},
+        },
+    },
+}
+
+_current = contextvars.ContextVar("llm_route", default=None)
+
+
+def _merge(base: dict, override: dict) -> dict:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _routes() -> dict:
+    raw = os.getenv("LLM_ROUTING", "")
+    if not raw:
+        return ROUTES
+    try:
+        return _merge(ROUTES, json.loads(raw))
+    except ValueError:
+        return ROUTES
+
+
+def _tier_model(tier: str) -> str:
+    default = os.getenv("LLM_MODEL", os.getenv("OPENAI_MODEL", "gpt-4"))
+    if tier == "small":
+        return os.getenv("LLM_MODEL_SMALL", default)
+    if tier == "large":
+        return os.getenv("LLM_MODEL_LARGE", default)
+    return default
+
+
+def resolve_route(agent_key: str | None = None, mode: str | None = None) -> dict:
+    """agent_key/mode에 해당하는 {"model", "max_tokens", "temperature"}를 반환한다."""
+    routes = _routes()
+    route = dict(routes.get("default", {}))
+    if agent_key:
+        route.update(routes.get("agents", {}).get(agent_key, {}))
+    if mode:
+        mode_routes = routes.get("modes", {}).get(mode, {})
+        route.update(mode_routes.get("*", {}))
+        if agent_key:
+            route.update(mode_routes.get(agent_key, {}))
+    return {
+        "model": route.get("model") or _tier_model(route.get("tier", "large")),
+        "max_tokens": int(route.get("max_tokens", 4096)),
+        "temperature": float(route.get("temperature", 0.3)),
+    }
+
+
+@contextmanager
+def routed(agent_key: str | None = None, mode: str | None = None):
+    """블록 안의 LLM 호출에 agent_key/mode 라우팅을 적용한다."""
+    token = _current.set(resolve_route(agent_key, mode))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_route() -> dict | None:
+    """현재 컨텍스트에 적용된 라우트. routed 블록 밖이면 None."""
+    return _current.get()
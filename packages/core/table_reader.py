@@ -0,0 +1,323 @@
+"""표 추출 — Excel/CSV/Word 표를 헤더와 열 유형을 가진 구조로 읽는다.
+
+file_reader의 " | " 결합 텍스트는 빈 셀까지 토큰을 쓰고 열 의미를 잃는다.
+여기서는 빈 행/열을 버리고 제목 행과 헤더 행을 찾아 열 유형(number/date/text)을
+판정한 뒤 CSV 또는 JSON Lines로 간결하게 직렬화한다. 재무/DD 에이전트는
+Table.select로 관련 열/행만 받을 수 있다.
+
+환경변수:
+  - TABLE_FORMAT : 프롬프트용 표 직렬화 형식, csv 또는 jsonl (기본 csv)
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+from packages.core.file_reader import (
+    cache_get,
+    cache_put,
+    extract_text,
+    iter_records,
+    read_upload,
+    row_limit,
+    row_limit_notice,
+    size_error,
+    upload_key,
+)
+
+TABLE_EXTENSIONS = (".xlsx", ".xls", ".csv", ".docx")
+
+# 헤더 위의 제목/단위 행으로 볼 최대 행 수
+_MAX_TITLE_ROWS = 5
+
+_NUMBER = re.compile(r"^\(?[-+]?[\d,]*\.?\d+\)?%?$")
+# 재무제표 기간 헤더 "2021.12", "2021.12.31" (숫자로 읽으면 헤더 행이 데이터 행이 된다)
+_PERIOD = re.compile(r"^(?:19|20)\d{2}\.(?:0[1-9]|1[0-2])(?:\.\d{2})?\.?$")
+
+
+@dataclass
+class Table:
+    """헤더와 열 유형이 있는 표 하나."""
+    source: str
+    name: str
+    columns: list[str]
+    types: list[str]
+    rows: list[list]
+    titles: list[str] = field(default_factory=list)
+
+    def select(self, keywords) -> "Table":
+        """keywords와 관련된 열/행만 남긴 표.
+
+        헤더가 키워드를 포함하는 열이 있으면 텍스트(라벨) 열과 그 열만 남기고,
+        텍스트 셀이 키워드를 포함하는 행이 있으면 그 행만 남긴다.
+        어느 쪽도 맞지 않으면 원래 표를 그대로 쓴다.
+        """
+        words = [k.lower() for k in keywords]
+
+        def hit(value) -> bool:
+            return isinstance(value, str) and any(w in value.lower() for w in words)
+
+        keep = [i for i, name in enumerate(self.columns) if hit(name)]
+        if keep:
+            keep = sorted(set(keep) | {i for i, t in enumerate(self.types) if t == "text"})
+        else:
+            keep = list(range(len(self.columns)))
+        rows = [row for row in self.rows if any(hit(v) for v in row)] or self.rows
+        return Table(
+            source=self.source,
+            name=self.name,
+            columns=[self.columns[i] for i in keep],
+            types=[self.types[i] for i in keep],
+            rows=[[row[i] for i in keep] for row in rows],
+            titles=self.titles,
+        )
+
+    def to_csv(self) -> str:
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(self.columns)
+        for row in self.rows:
+            writer.writerow([_format(v) for v in row])
+        return buf.getvalue().rstrip("\n")
+
+    def to_jsonl(self) -> str:
+        lines = []
+        for row in self.rows:
+            record = {c: _format(v) for c, v in zip(self.columns, row) if v is not None}
+            lines.append(json.dumps(record, ensure_ascii=False))
+        return "\n".join(lines)
+
+    def to_text(self, fmt: str | None = None) -> str:
+        """프롬프트용 표 텍스트 (머리말 + CSV/JSONL)."""
+        fmt = fmt or os.getenv("TABLE_FORMAT", "csv")
+        header = f"[표: {self.name}] {len(self.rows)}행 × {len(self.columns)}열"
+        lines = [header]
+        lines.extend(self.titles)
+        lines.append("열 유형: " + ", ".join(f"{c}={t}" for c, t in zip(self.columns, self.types)))
+        lines.append(self.to_jsonl() if fmt == "jsonl" else self.to_csv())
+        return "\n".join(lines)
+
+
+# ═══════════════════════════════════════════
+# 공개 API
+# ═══════════════════════════════════════════
+
+def extract_tables(file_obj) -> list[Table]:
+    """업로드된 Excel/CSV/Word 파일의 표 목록. 그 외 형식이거나 FILE_MAX_MB를 넘으면 빈 리스트."""
+    source = file_obj.name
+    name = source.lower()
+    if not name.endswith(TABLE_EXTENSIONS) or size_error(file_obj):
+        return []
+    data = read_upload(file_obj)
+    if size_error(file_obj, data):
+        return []
+    key = upload_key(file_obj)
+    cached = cache_get(key, "tables")
+    if cached is not None:
+        return cached
+
+    try:
+        if name.endswith(".csv"):
+            grids = [("CSV", *_csv_grid(data))]
+        elif name.endswith(".docx"):
+            grids = _docx_grids(data)
+        else:
+            grids = _excel_grids(data)
+    except Exception:
+        # 표 추출 실패 시 호출 측은 extract_text 결과를 그대로 쓴다
+        grids = []
+    tables = [t for t in (_build_table(source, label, grid, notice) for label, grid, notice in grids) if t is not None]
+    # 표 객체는 같은 파일 항목에 메모리로만 둔다
+    cache_put(key, tables=tables)
+    return tables
+
+
+def compact_text(file_obj) -> str:
+    """프롬프트용 업로드 텍스트. 표가 있는 형식은 표를 CSV/JSONL로 간결하게 직렬화한다.
+
+    Word는 본문 문단 + 표, Excel/CSV는 시트별 표로 구성하고, 표를 찾지 못하거나
+    다른 형식이면 extract_text 결과를 그대로 반환한다. FILE_MAX_MB를 넘으면
+    extract_text와 같은 오류 메시지를 반환한다.
+    """
+    name = file_obj.name.lower()
+    if not name.endswith(TABLE_EXTENSIONS):
+        return extract_text(file_obj)
+    error = size_error(file_obj)
+    if error:
+        return error
+    error = size_error(file_obj, read_upload(file_obj))
+    if error:
+        return error
+    fmt = os.getenv("TABLE_FORMAT", "csv")
+    key = upload_key(file_obj)
+    slot = f"tables-{fmt}"
+    cached = cache_get(key, slot)
+    if cached is not None:
+        return cached
+
+    tables = extract_tables(file_obj)
+    if not tables:
+        return extract_text(file_obj)
+    parts = []
+    if name.endswith(".docx"):
+        parts.extend(r.text for r in iter_records(file_obj) if r.kind == "paragraph")
+    parts.extend(t.to_text(fmt) for t in tables)
+    text = "\n\n".join(parts)
+    cache_put(key, **{slot: text})
+    return text
+
+
+# ═══════════════════════════════════════════
+# 형식별 셀 격자 읽기
+# ═══════════════════════════════════════════
+
+# 격자 하나: (라벨, 셀 행 목록, 행 제한 안내 또는 None)
+
+def _excel_grids(data: bytes) -> list[tuple[str, list[list], str | None]]:
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        return [(sheet_name, *_limited(wb[sheet_name].iter_rows(values_only=True))) for sheet_name in wb.sheetnames]
+    finally:
+        wb.close()
+
+
+def _csv_grid(data: bytes) -> tuple[list[list], str | None]:
+    text = data.decode("utf-8-sig", errors="replace")
+    return _limited(csv.reader(io.StringIO(text)))
+
+
+def _limited(rows) -> tuple[list[list], str | None]:
+    """빈 행을 버리고 EXTRACT_MAX_ROWS행까지 읽는다. 넘치면 file_reader와 같은 안내를 함께 반환한다."""
+    max_rows = row_limit()
+    grid = []
+    for number, row in enumerate(rows, start=1):
+        if not any(_present(v) for v in row):
+            continue
+        if len(grid) >= max_rows:
+            return grid, row_limit_notice(max_rows, number)
+        grid.append(list(row))
+    return grid, None
+
+
+def _docx_grids(data: bytes) -> list[tuple[str, list[list], str | None]]:
+    from docx import Document
+    doc = Document(io.BytesIO(data))
+    return [
+        (f"표 {i}", [[cell.text.strip() for cell in row.cells] for row in table.rows], None)
+        for i, table in enumerate(doc.tables, start=1)
+    ]
+
+
+# ═══════════════════════════════════════════
+# 헤더/열 유형 판정
+# ═══════════════════════════════════════════
+
+def _present(value) -> bool:
+    return value is not None and not (isinstance(value, str) and not value.strip())
+
+
+def _parse(value, header: bool = False):
+    """셀 값을 number/date/text 값으로 정규화한다. "1,234", "(500)", "12.5%"는 숫자로 본다.
+
+    header이면 "2021.12" 같은 기간 표기는 숫자가 아닌 텍스트로 둔다.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    if header and _PERIOD.match(text):
+        return text
+    if _NUMBER.match(text) and any(ch.isdigit() for ch in text):
+        negative = text.startswith("(") and text.endswith(")")
+        number = text.strip("()").replace(",", "")
+        percent = number.endswith("%")
+        number = float(number.rstrip("%"))
+        if percent:
+            number /= 100
+        if negative:
+            number = -number
+        return int(number) if number.is_integer() and not percent else number
+    return text
+
+
+def _kind(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "number"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return "date"
+    return "text"
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, 6)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _is_header(row: list) -> bool:
+    values = [v for v in row if v is not None]
+    return len(values) >= 2 and all(_kind(v) == "text" or isinstance(v, int) and 1900 <= v <= 2100 for v in values)
+
+
+def _build_table(source: str, label: str, grid: list[list], notice: str | None = None) -> Table | None:
+    grid = [row for row in grid if any(_present(v) for v in row)]
+    rows = [[_parse(v) for v in row] for row in grid]
+    if not rows:
+        return None
+    width = max(len(row) for row in rows)
+    rows = [row + [None] * (width - len(row)) for row in rows]
+
+    # 값이 하나뿐인 앞쪽 행은 제목/단위 행 ("손익계산서", "(단위: 백만원)")
+    titles = []
+    while rows and len(titles) < _MAX_TITLE_ROWS and width > 1 and sum(v is not None for v in rows[0]) <= 1:
+        titles.append(str(_format(next(v for v in rows[0] if v is not None))))
+        rows.pop(0)
+    if not rows:
+        return None
+
+    # 헤더 후보는 원래 셀에서 다시 읽어 기간 표기("2021.12")를 텍스트로 둔다
+    candidate = [_parse(v, header=True) for v in grid[len(titles)]]
+    candidate += [None] * (width - len(candidate))
+    header = None
+    if len(rows) > 1 and _is_header(candidate):
+        rows.pop(0)
+        header = candidate
+
+    # 데이터가 하나도 없는 열 제거
+    keep = [i for i in range(width) if any(row[i] is not None for row in rows)]
+    if not keep:
+        return None
+    columns = []
+    for n, i in enumerate(keep, start=1):
+        name = _format(header[i]) if header and header[i] is not None else ""
+        columns.append(str(name) or f"col{n}")
+    rows = [[row[i] for i in keep] for row in rows]
+
+    types = []
+    for c in range(len(keep)):
+        kinds = {_kind(row[c]) for row in rows} - {None}
+        types.append(kinds.pop() if len(kinds) == 1 else "text")
+    # 행 제한으로 잘린 표는 to_text 머리말에 그 사실을 남긴다
+    if notice:
+        titles.append(notice)
+    return Table(source=source, name=label, columns=columns, types=types, rows=rows, titles=titles)
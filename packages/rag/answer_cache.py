@@ -0,0 +1,108 @@
+"""의미 기반 답변 캐시 — 비슷한 질문에 같은 출처가 검색되면 저장된 답변을 재사용한다.
+
+키는 (질의 임베딩, 검색된 질의회신 id 집합)이다. 출처 id 집합이 같고 질의 임베딩의
+코사인 거리가 임계값 이하인 항목이 있으면 적중으로 보고 답변과 출처를 그대로 돌려준다.
+이전 대화가 없는 첫 질문에만 쓴다 (대화 맥락이 있으면 같은 질문도 답이 달라진다).
+항목은 코퍼스 버전(vector_store.corpus_version)과 함께 저장되고, 버전이 바뀌면 전부 버린다.
+
+환경변수:
+  - RAG_ANSWER_CACHE_SIZE     : 최대 항목 수, 초과 시 LRU 삭제 (기본 256, 0이면 비활성화)
+  - RAG_ANSWER_CACHE_DISTANCE : 적중으로 볼 최대 코사인 거리 (기본 0.05)
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_cache = None
+_cache_config = None
+_cache_lock = threading.Lock()
+
+
+class AnswerCache:
+    """스레드 안전한 메모리 내 LRU 의미 캐시."""
+
+    def __init__(self, max_entries: int, max_distance: float):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # 정규화한 질의 텍스트 -> entry
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding, source_ids: list[str], version: str) -> dict | None:
+        """출처가 같고 가장 가까운 항목의 {"answer", "sources", "distance"}. 없으면 None."""
+        query = _unit(embedding)
+        sources = frozenset(source_ids)
+        with self._lock:
+            self._check_version(version)
+            best, best_distance = None, self.max_distance
+            for key, entry in self._entries.items():
+                if entry["source_ids"] != sources:
+                    continue
+                distance = float(1 - entry["embedding"] @ query)
+                if distance <= best_distance:
+                    best, best_distance = key, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            entry = self._entries[best]
+            # 호출자가 출처 목록을 고쳐도 캐시 항목이 바뀌지 않도록 복사해서 준다
+            return {"answer": entry["answer"], "sources": [dict(s) for s in entry["sources"]], "distance": best_distance}
+
+    def store(self, query: str, embedding, source_ids: list[str], version: str, answer: str, sources: list[dict]):
+        with self._lock:
+            self._check_version(version)
+            key = " ".join(query.split())
+            self._entries[key] = {
+                "embedding": _unit(embedding),
+                # 융합 순위가 조금 바뀌어도 같은 근거면 같은 답변이므로 순서는 보지 않는다
+                "source_ids": frozenset(source_ids),
+                "answer": answer,
+                "sources": [dict(s) for s in sources],
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _check_version(self, version: str):
+        # 코퍼스가 바뀌면 검색 결과와 답변 근거가 달라지므로 전부 무효화
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "version": self.version}
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def get_cache() -> AnswerCache | None:
+    """env 설정에 맞는 캐시 인스턴스를 반환한다. 비활성화 상태면 None."""
+    global _cache, _cache_config
+    config = (
+        int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256")),
+        float(os.getenv("RAG_ANSWER_CACHE_DISTANCE", "0.05")),
+    )
+    if config[0] <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None or config != _cache_config:
+            _cache = AnswerCache(*config)
+            _cache_config = config
+    return _cache
@@ -1,7 +1,23 @@
-"""회계 질의회신 RAG 챗 엔진."""
+"""회계 질의회신 RAG 챗 엔진.
 
-from packages.rag.vector_store import search
-from packages.core.llm_client import generate_chat
+이전 대화가 없는 질문은 의미 기반 답변 캐시(answer_cache)를 먼저 조회해, 비슷한 질문에
+같은 질의회신이 검색되면 LLM을 호출하지 않고 저장된 답변을 돌려준다.
+
+환경변수:
+  - RAG_WARMUP : 랜딩 페이지 렌더 후 백그라운드 워밍업 실행 여부 (기본 1, 0이면 비활성화)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from packages.rag import vector_store
+from packages.rag.answer_cache import get_cache as get_answer_cache
+from packages.rag.vector_store import corpus_version, embed_query, search
+from packages.core import llm_client
+from packages.core.llm_client import agenerate_chat, generate_chat, stream_chat
 
 _SYSTEM_PROMPT = """당신은 한국채택국제회계기준(K-IFRS) 전문가입니다.
 사용자의 회계 관련 질문에 대해 제공된 질의회신 자료를 근거로 정확하고 전문적인 답변을 제공합니다.
@@ -14,16 +30,159 @@ _SYSTEM_PROMPT = """당신은 한국채택국제회계기준(K-IFRS) 전문가
 5. 한국어로 답변하세요."""
 
 
+# llm_client가 호출 실패 시 돌려주는 메시지 접두어 (캐시하지 않는다)
+_LLM_ERROR_PREFIX = "[LLM 호출 오류]"
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+_warm_up_result = None
+
+
+def warm_up() -> dict:
+    """첫 질문 지연이 정상 상태와 같도록 검색/LLM 경로를 미리 준비한다.
+
+    벡터 스토어(컬렉션 + 임베딩 모델)와 LLM 엔드포인트 커넥션을 동시에 준비한다.
+    서버 시작 시 직접 호출하거나 start_warm_up으로 백그라운드에서 실행한다.
+
+    Returns:
+        {"vector_store": 초 또는 None, "llm": [엔드포인트별 결과], "seconds": 전체 초, "errors": [...]}
+    """
+    start = time.perf_counter()
+    result = {"vector_store": None, "llm": [], "errors": []}
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-warmup") as pool:
+        store = pool.submit(vector_store.warm_up)
+        llm = pool.submit(llm_client.warm_up)
+        try:
+            result["vector_store"] = store.result()
+        except Exception as e:
+            result["errors"].append(f"vector_store: {e}")
+        try:
+            result["llm"] = llm.result()
+        except Exception as e:
+            result["errors"].append(f"llm: {e}")
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def start_warm_up() -> threading.Thread | None:
+    """warm_up을 데몬 스레드에서 프로세스당 한 번만 실행한다. 이미 시작했거나 꺼져 있으면 그대로 반환한다."""
+    global _warm_up_thread
+    if os.getenv("RAG_WARMUP", "1") == "0":
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_run_warm_up, name="rag-warmup", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def warm_up_status() -> dict | None:
+    """백그라운드 워밍업 결과. 아직 끝나지 않았으면 None."""
+    return _warm_up_result
+
+
+def _run_warm_up():
+    global _warm_up_result
+    _warm_up_result = warm_up()
+
+
 def answer(query: str, chat_history: list[dict] = None) -> dict:
     """RAG 기반 답변 생성.
 
     Returns:
-        {"answer": str, "sources": [{"id", "category", "question", "source", "date"}]}
+        {"answer": str, "sources": [{"id", "category", "question", "source", "date"}], "cached": bool}
+    """
+    # 1. 관련 질의회신 검색 (첫 질문이면 답변 캐시 조회)
+    retrieved, cached, remember = _retrieve(query, chat_history)
+    if cached:
+        return {"answer": cached["answer"], "sources": cached["sources"], "cached": True}
+
+    # 2~3. 컨텍스트 및 메시지 구성
+    messages = _build_messages(query, chat_history, retrieved)
+
+    # 4. LLM 호출
+    answer_text = generate_chat(messages)
+    if remember:
+        remember(answer_text)
+
+    # 5. 출처 정보 정리
+    return {"answer": answer_text, "sources": _format_sources(retrieved), "cached": False}
+
+
+async def aanswer(query: str, chat_history: list[dict] = None) -> dict:
+    """answer의 asyncio 버전. 검색은 스레드에서, LLM 호출은 이벤트 루프에서 수행한다."""
+    retrieved, cached, remember = await asyncio.to_thread(_retrieve, query, chat_history)
+    if cached:
+        return {"answer": cached["answer"], "sources": cached["sources"], "cached": True}
+    messages = _build_messages(query, chat_history, retrieved)
+    answer_text = await agenerate_chat(messages)
+    if remember:
+        remember(answer_text)
+    return {"answer": answer_text, "sources": _format_sources(retrieved), "cached": False}
+
+
+def stream_answer(query: str, chat_history: list[dict] = None) -> dict:
+    """answer의 스트리밍 버전. 검색은 즉시 수행하고 답변은 generator로 반환한다.
+
+    Returns:
+        {"stream": Iterator[str], "sources": [...], "cached": bool}
+    """
+    retrieved, cached, remember = _retrieve(query, chat_history)
+    if cached:
+        return {"stream": iter([cached["answer"]]), "sources": cached["sources"], "cached": True}
+    messages = _build_messages(query, chat_history, retrieved)
+    stream = stream_chat(messages)
+    if remember:
+        stream = _remember_stream(stream, remember)
+    return {"stream": stream, "sources": _format_sources(retrieved), "cached": False}
+
+
+def _retrieve(query: str, chat_history: list[dict]):
+    """질의회신을 검색하고, 이전 대화가 없으면 답변 캐시를 조회한다.
+
+    Returns:
+        (retrieved, cached, remember) — cached는 적중 시 {"answer", "sources", "distance"},
+        remember(answer_text)는 새 답변을 캐시에 넣는 함수 (캐시를 쓰지 않거나 적중이면 None)
     """
-    # 1. 관련 질의회신 검색
-    retrieved = search(query, top_k=3)
+    cache = None if chat_history else get_answer_cache()
+    if cache is None:
+        return search(query, top_k=3), None, None
 
-    # 2. 컨텍스트 구성
+    embedding = embed_query(query)
+    retrieved = search(query, top_k=3, query_embedding=embedding)
+    source_ids = [doc["id"] for doc in retrieved]
+    version = corpus_version()
+    cached = cache.lookup(embedding, source_ids, version)
+    if cached:
+        return retrieved, cached, None
+
+    def remember(answer_text: str):
+        # 일부를 받은 뒤 실패한 스트림은 오류 메시지가 중간에 붙는다
+        if answer_text and _LLM_ERROR_PREFIX not in answer_text:
+            cache.store(query, embedding, source_ids, version, answer_text, _format_sources(retrieved))
+
+    return retrieved, None, remember
+
+
+def _remember_stream(stream, remember):
+    """스트림을 그대로 흘려보내고, 오류 없이 끝까지 받았을 때만 전체 답변을 캐시에 넣는다.
+
+    llm_client 스트림은 실패하면 그때까지의 조각 뒤에 오류 메시지를 별도 조각으로 낸다.
+    소비자가 중간에 멈추거나(GeneratorExit) 예외가 나면 여기까지 오지 않는다.
+    """
+    parts = []
+    failed = False
+    for chunk in stream:
+        failed = failed or chunk.startswith(_LLM_ERROR_PREFIX)
+        parts.append(chunk)
+        yield chunk
+    if not failed:
+        remember("".join(parts))
+
+
+def _build_messages(query: str, chat_history: list[dict], retrieved: list[dict]) -> list[dict]:
+    """검색 결과와 대화 히스토리로 LLM 메시지를 구성한다."""
+    # 컨텍스트 구성
     context_parts = []
     for i, doc in enumerate(retrieved, 1):
         context_parts.append(
@@ -35,7 +194,7 @@ def answer(query: str, chat_history: list[dict] = None) -> dict:
         )
     context_text = "\n\n".join(context_parts)
 
-    # 3. 메시지 구성
+    # 메시지 구성
     messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
 
     # 대화 히스토리 추가 (최근 10개까지)
@@ -53,12 +212,11 @@ def answer(query: str, chat_history: list[dict] = None) -> dict:
 질문: {query}"""
 
     messages.append({"role": "user", "content": user_message})
+    return messages
 
-    # 4. LLM 호출
-    answer_text = generate_chat(messages)
 
-    # 5. 출처 정보 정리
-    sources = [
+def _format_sources(retrieved: list[dict]) -> list[dict]:
+    return [
         {
             "id": doc["id"],
             "category": doc["category"],
@@ -68,5 +226,3 @@ def answer(query: str, chat_history: list[dict] = None) -> dict:
         }
         for doc in retrieved
     ]
-
-    return {"answer": answer_text, "sources": sources}
@@ -0,0 +1,109 @@
+"""업로드 문서 패시지 인덱스 — 에이전트 주제별 top-k 발췌 검색.
+
+업로드 원문을 위치 정보가 붙은 패시지로 나눠 업로드 해시당 한 번만 BM25로
+색인하고, 각 에이전트는 자기 주제 쿼리로 관련 패시지만 가져간다.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from packages.rag.lexical_index import BM25Index
+
+_FILE_HEADER = re.compile(r"^\[파일: (.+?)\]\s*$", re.MULTILINE)
+
+# 최근 업로드 인덱스 (해시 -> DocumentIndex)
+_MAX_INDEXES = 8
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _units(text: str, size: int):
+    """문단 → 줄 → 고정 길이 순으로 잘라 size 이하의 단위를 (offset, text)로 낸다."""
+    offset = 0
+    for para in text.split("\n\n"):
+        if len(para) <= size:
+            yield offset, para
+        else:
+            line_offset = offset
+            for line in para.split("\n"):
+                for i in range(0, max(len(line), 1), size):
+                    yield line_offset + i, line[i:i + size]
+                line_offset += len(line) + 1
+        offset += len(para) + 2
+
+
+def split_passages(text: str, size: int) -> list[dict]:
+    """원문을 size 내외의 패시지로 나눈다.
+
+    Returns:
+        [{"location": "파일명 · 문자 a–b", "file": str, "start": int, "end": int, "text": str}]
+    """
+    passages = []
+    current_file = "업로드 자료"
+    buf = []
+    buf_len = 0
+    start = 0
+
+    def flush(end):
+        if buf:
+            passages.append({
+                "location": f"{current_file} · 문자 {start:,}–{end:,}",
+                "file": current_file,
+                "start": start,
+                "end": end,
+                "text": "\n".join(buf),
+            })
+
+    end = 0
+    for offset, unit in _units(text, size):
+        header = _FILE_HEADER.match(unit)
+        if buf and (header or buf_len + len(unit) > size):
+            flush(end)
+            buf, buf_len, start = [], 0, offset
+        if header:
+            current_file = header.group(1)
+        if not buf:
+            start = offset
+        if unit.strip():
+            buf.append(unit)
+            buf_len += len(unit) + 1
+        end = offset + len(unit)
+    flush(end)
+    return passages
+
+
+class DocumentIndex:
+    """업로드 원문 하나에 대한 패시지 + BM25 인덱스."""
+
+    def __init__(self, text: str, passage_chars: int):
+        self.passages = split_passages(text, passage_chars)
+        self.index = BM25Index([p["text"] for p in self.passages])
+
+    def retrieve(self, query: str, top_k: int, keep=None) -> list[dict]:
+        """쿼리와 관련된 패시지 top_k개를 원문 순서대로 반환한다.
+
+        keep(passage)이 주어지면 참인 패시지 중에서만 고른다.
+        """
+        if keep is None:
+            hits = self.index.search(query, top_k)
+        else:
+            hits = [h for h in self.index.search(query, self.index.size) if keep(self.passages[h[0]])][:top_k]
+        return [self.passages[idx] for idx in sorted(idx for idx, _ in hits)]
+
+
+def get_index(text: str, passage_chars: int = 1500) -> DocumentIndex:
+    """업로드 해시별 인덱스를 반환한다 (처음 요청 시 한 번만 색인)."""
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), passage_chars)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+        index = DocumentIndex(text, passage_chars)
+        _indexes[key] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+        return index
@@ -0,0 +1,110 @@
+"""문장 임베딩 — chromadb 없이 all-MiniLM-L6-v2 ONNX 모델을 직접 돌린다.
+
+chroma 기본 임베딩 함수(ONNXMiniLM_L6_V2)와 같은 모델 파일, 토크나이저 설정
+(길이 256 고정 패딩/절단), attention 가중 평균 풀링, L2 정규화를 그대로 따르므로
+chroma 컬렉션에 저장된 벡터와 같은 공간이다. onnxruntime과 tokenizers만 쓰며,
+chromadb(모듈 수십 개) import 비용 없이 numpy 백엔드 검색과 질의 임베딩을 한다.
+
+모델 파일은 chroma와 같은 캐시 디렉터리를 쓰고, 없으면 chroma와 같은 주소에서
+받아 SHA-256을 확인한 뒤 푼다.
+
+환경변수:
+  - EMBEDDING_MODEL_DIR : 모델 디렉터리 (기본 ~/.cache/chroma/onnx_models/all-MiniLM-L6-v2)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tarfile
+import threading
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+MODEL_URL = "https://chroma-onnx-models.s3.amazonaws.com/all-MiniLM-L6-v2/onnx.tar.gz"
+MODEL_SHA256 = "913d7300ceae3b2dbc2c50d1de4baacab4be7b9380491c27fab7418616a16ec3"
+MAX_TOKENS = 256
+BATCH_SIZE = 32
+
+_DEFAULT_DIR = Path.home() / ".cache" / "chroma" / "onnx_models" / "all-MiniLM-L6-v2"
+_MODEL_FILES = ("model.onnx", "tokenizer.json")
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+class MiniLMEmbedding:
+    """chroma Collection의 embedding_function과 같은 호출 규약: 문서 목록 -> 벡터 목록."""
+
+    def __init__(self, directory: Path):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        folder = _ensure_model(directory)
+        self.tokenizer = Tokenizer.from_file(str(folder / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=MAX_TOKENS)
+        options = onnxruntime.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = [p for p in onnxruntime.get_available_providers() if p != "CoreMLExecutionProvider"]
+        self.session = onnxruntime.InferenceSession(str(folder / "model.onnx"), providers=providers, sess_options=options)
+
+    def __call__(self, texts: list[str]) -> list[np.ndarray]:
+        out = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            encoded = self.tokenizer.encode_batch(list(texts[start:start + BATCH_SIZE]))
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            hidden = self.session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            })[0]
+            weights = mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            norms[norms == 0] = 1e-12
+            out.extend((pooled / norms).astype(np.float32))
+        return out
+
+
+def get_embedder() -> MiniLMEmbedding:
+    """프로세스 공용 임베딩 함수 (처음 쓸 때 모델을 연다)."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = MiniLMEmbedding(Path(os.getenv("EMBEDDING_MODEL_DIR", str(_DEFAULT_DIR))))
+    return _embedder
+
+
+def _ensure_model(directory: Path) -> Path:
+    """모델 파일이 있는 폴더. 없으면 받아서 푼다."""
+    folder = directory / "onnx"
+    if all((folder / name).exists() for name in _MODEL_FILES):
+        return folder
+    directory.mkdir(parents=True, exist_ok=True)
+    archive = directory / "onnx.tar.gz"
+    if not archive.exists() or _sha256(archive) != MODEL_SHA256:
+        tmp = archive.with_suffix(".tmp")
+        urllib.request.urlretrieve(MODEL_URL, tmp)
+        if _sha256(tmp) != MODEL_SHA256:
+            tmp.unlink()
+            raise ValueError(f"임베딩 모델 파일의 SHA-256이 맞지 않습니다: {MODEL_URL}")
+        os.replace(tmp, archive)
+    with tarfile.open(archive, "r:gz") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(directory, filter="data")
+        else:
+            tar.extractall(directory)
+    return folder
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
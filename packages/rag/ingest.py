@@ -0,0 +1,234 @@
+"""질의회신 대량 적재 CLI — JSONL을 스트리밍으로 읽어 병렬 임베딩 후 컬렉션에 기록한다.
+
+수십만 건 규모의 KASB/FSS 질의회신 아카이브를 메모리에 다 올리지 않고 batch 단위로
+읽어 임베딩 스레드 풀에 넘기고, 결과를 입력 순서대로 upsert한다. 기록할 때마다
+입력 파일의 바이트 오프셋을 체크포인트로 남기므로 중단 후 다시 실행하면 이어서 적재한다.
+upsert라서 마지막 체크포인트 이후 일부가 이미 기록돼 있어도 중복되지 않는다.
+체크포인트에는 입력 크기/수정 시각과 오프셋 앞부분의 지문도 남겨, 그 사이 입력이
+바뀌었으면(뒤에 덧붙인 경우 제외) 처음부터 다시 적재한다.
+
+입력 한 줄: {"id", "category", "question", "answer", "source", "date"}
+적재한 레코드의 origin은 입력 파일명이라 sample_qa.json 동기화가 지우지 않는다.
+numpy 백엔드는 기록마다 파일 전체를 다시 쓰므로(배치 수의 제곱에 비례), 활성 컬렉션이
+numpy면 --force 없이는 적재하지 않는다. 대량 적재는 chroma 백엔드로 한 뒤
+vector_store.build_numpy_index()로 옮긴다.
+
+사용법:
+    python -m packages.rag.ingest data/accounting_qa/archive.jsonl
+    python -m packages.rag.ingest archive.jsonl --batch-size 512 --workers 8
+    python -m packages.rag.ingest archive.jsonl --restart          # 체크포인트 무시
+    VECTOR_BACKEND=numpy python -m packages.rag.ingest small.jsonl --force
+
+환경변수:
+  - INGEST_BATCH_SIZE : 임베딩/기록 배치 크기 (기본 256)
+  - INGEST_WORKERS    : 동시에 임베딩하는 배치 수 (기본 4)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from packages.rag import vector_store
+
+REQUIRED_FIELDS = ("id", "question", "answer")
+
+# 체크포인트 지문에 쓰는 입력 앞부분/오프셋 직전 구간 크기
+_FINGERPRINT_BYTES = 64 * 1024
+
+
+def _batches(path: Path, offset: int, batch_size: int, errors: list):
+    """offset부터 JSONL을 읽어 (레코드 목록, 배치 끝 오프셋)을 낸다. 잘못된 줄은 errors에 (줄 오프셋, 사유)."""
+    batch = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError(f"JSON 객체가 아님: {type(item).__name__}")
+                missing = [k for k in REQUIRED_FIELDS if not item.get(k)]
+                if missing:
+                    raise ValueError(f"필수 필드 없음: {', '.join(missing)}")
+            except ValueError as e:
+                errors.append((line_offset, str(e)))
+                continue
+            batch.append({
+                "id": str(item["id"]),
+                "category": item.get("category", ""),
+                "question": item["question"],
+                "answer": item["answer"],
+                "source": item.get("source", ""),
+                "date": item.get("date", ""),
+            })
+            if len(batch) >= batch_size:
+                yield batch, offset
+                batch = []
+    if batch:
+        yield batch, offset
+
+
+def _embed_batch(batch: list[dict], origin: str) -> tuple[list, list, list, list]:
+    documents = [vector_store._document(item) for item in batch]
+    embeddings = vector_store._embed(documents)
+    return [item["id"] for item in batch], documents, [vector_store._metadata(item, origin) for item in batch], embeddings
+
+
+def _fingerprint(path: Path, offset: int) -> str:
+    """입력 맨 앞과 offset 직전 _FINGERPRINT_BYTES씩의 해시. 이미 적재한 구간이 그대로인지 본다."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(offset, _FINGERPRINT_BYTES)))
+        tail = max(0, offset - _FINGERPRINT_BYTES)
+        f.seek(tail)
+        digest.update(f.read(offset - tail))
+    return digest.hexdigest()
+
+
+def _load_checkpoint(checkpoint: Path, path: Path, progress=print) -> dict:
+    if not checkpoint.exists():
+        return {"offset": 0, "records": 0}
+    with open(checkpoint, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    stat = path.stat()
+    offset = state.get("offset", 0)
+    if state.get("input") != str(path.resolve()) or offset > stat.st_size:
+        return {"offset": 0, "records": 0}
+    if (state.get("size"), state.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return state
+    # 크기/수정 시각이 바뀌었어도 적재한 구간이 같으면 뒤에 덧붙인 것이므로 이어서
+    if state.get("fingerprint") != _fingerprint(path, offset):
+        progress("체크포인트 이후 입력 파일이 바뀌어 처음부터 적재합니다")
+        return {"offset": 0, "records": 0}
+    return state
+
+
+def _save_checkpoint(checkpoint: Path, path: Path, offset: int, records: int):
+    stat = path.stat()
+    tmp = checkpoint.with_suffix(checkpoint.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "input": str(path.resolve()),
+            "offset": offset,
+            "records": records,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "fingerprint": _fingerprint(path, offset),
+        }, f)
+    os.replace(tmp, checkpoint)
+
+
+def ingest(
+    path: Path,
+    batch_size: int | None = None,
+    workers: int | None = None,
+    checkpoint: Path | None = None,
+    restart: bool = False,
+    progress=print,
+    force: bool = False,
+) -> dict:
+    """JSONL 파일을 컬렉션에 적재한다.
+
+    Returns:
+        {"records", "skipped", "resumed_from", "seconds", "records_per_sec", "count"}
+
+    Raises:
+        RuntimeError: 활성 컬렉션이 numpy 백엔드인데 force가 아닐 때
+    """
+    from packages.rag.numpy_index import NumpyCollection
+    collection = vector_store._get_collection()
+    if isinstance(collection, NumpyCollection):
+        if not force:
+            raise RuntimeError(
+                "numpy 백엔드는 배치마다 인덱스 전체를 다시 써서 대량 적재가 매우 느립니다. "
+                "VECTOR_BACKEND=chroma로 적재한 뒤 build_numpy_index()로 옮기거나, --force로 강행하세요."
+            )
+        progress("경고: numpy 백엔드에 적재합니다. 배치마다 인덱스 전체를 다시 씁니다.")
+
+    path = Path(path)
+    batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", "256"))
+    workers = max(1, workers or int(os.getenv("INGEST_WORKERS", "4")))
+    checkpoint = Path(checkpoint) if checkpoint else path.with_name(path.name + ".checkpoint.json")
+    state = {"offset": 0, "records": 0} if restart else _load_checkpoint(checkpoint, path, progress)
+    if state["offset"]:
+        progress(f"체크포인트에서 이어서 적재: {state['records']:,}건 이후 (바이트 {state['offset']:,})")
+
+    errors = []
+    records = 0
+    start = time.perf_counter()
+    last_report = start
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-embed") as pool:
+        # 입력 순서대로 기록해야 체크포인트 오프셋이 단조 증가하므로, 앞선 배치부터 기다린다
+        pending = deque()
+
+        def write_oldest():
+            nonlocal records, last_report
+            future, end_offset = pending.popleft()
+            ids, documents, metadatas, embeddings = future.result()
+            collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            records += len(ids)
+            _save_checkpoint(checkpoint, path, end_offset, state["records"] + records)
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                last_report = now
+                progress(f"{state['records'] + records:,}건 적재 · {records / (now - start):,.1f}건/초")
+
+        for batch, end_offset in _batches(path, state["offset"], batch_size, errors):
+            pending.append((pool.submit(_embed_batch, batch, path.name), end_offset))
+            if len(pending) >= workers * 2:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    seconds = time.perf_counter() - start
+    # 이 프로세스의 BM25 인덱스/코퍼스 버전도 새 내용으로
+    vector_store._build_lexical(collection)
+    for line_offset, reason in errors[:10]:
+        progress(f"건너뜀 (바이트 {line_offset:,}): {reason}")
+    result = {
+        "records": records,
+        "skipped": len(errors),
+        "resumed_from": state["records"],
+        "seconds": seconds,
+        "records_per_sec": records / seconds if seconds else 0.0,
+        "count": collection.count(),
+    }
+    progress(
+        f"완료: {records:,}건 적재, {len(errors):,}건 건너뜀, {seconds:.1f}초 "
+        f"({result['records_per_sec']:,.1f}건/초), 컬렉션 {result['count']:,}건"
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="질의회신 JSONL 파일")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--checkpoint", type=Path, default=None, help="기본: <입력>.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터 적재")
+    parser.add_argument("--force", action="store_true", help="numpy 백엔드여도 적재 (배치마다 인덱스 전체를 다시 씀)")
+    args = parser.parse_args()
+    if not args.input.exists():
+        print(f"입력 파일이 없습니다: {args.input}", file=sys.stderr)
+        return 1
+    try:
+        ingest(args.input, args.batch_size, args.workers, args.checkpoint, args.restart, force=args.force)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""어휘 기반 검색 인덱스 — 한국어 문자 n-gram + BM25.
+
+형태소 분석기 없이도 "전환사채", "K-IFRS 1115" 같은 용어가 잘 맞도록
+한글 어절은 문자 bigram으로, 영문/숫자 토큰은 그대로 색인한다.
+외부 의존성이 없어 업로드 문서 인덱싱과 질의회신 하이브리드 검색에 함께 쓴다.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+
+_TOKEN = re.compile(r"[가-힣]+|[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str, n: int = 2) -> list[str]:
+    """텍스트를 색인 토큰으로 나눈다. 한글은 문자 n-gram, 영문/숫자는 토큰 그대로."""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if "가" <= word[0] <= "힣":
+            if len(word) <= n:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """메모리 내 역색인 + Okapi BM25 점수."""
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_idx, tf)]
+        self.doc_lengths = []
+        for idx, doc in enumerate(documents):
+            counts = Counter(tokenize(doc))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((idx, tf))
+        self.size = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / self.size) if self.size else 0.0
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple[int, float]]:
+        """[(doc_idx, score)]를 점수 내림차순으로 반환한다."""
+        if not self.size:
+            return []
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / (self.avg_length or 1))
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
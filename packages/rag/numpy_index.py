@@ -0,0 +1,356 @@
+"""NumPy 벡터 인덱스 — chromadb 없이 메모리 매핑 파일로 정확한 top-k 검색.
+
+질의회신처럼 읽기 위주인 코퍼스는 SQLite + HNSW 스택 없이도 충분히 빠르다.
+정규화된 임베딩을 .npy(float32 또는 행별 스케일의 int8)로 저장해 mmap으로 열고,
+질의 벡터와의 행렬-벡터 곱 한 번으로 코사인 거리를 구한다. 여러 Streamlit
+워커 프로세스가 같은 파일을 열면 페이지 캐시를 공유한다.
+
+디렉터리 구성:
+  - gen-<n>/embeddings.npy : (N, D) float32 또는 int8
+  - gen-<n>/scales.npy     : (N,) float32, int8일 때 행별 역양자화 스케일
+  - meta.json              : {"generation", "dtype", "dim", "columns": {"ids": [...], "documents": [...], 필드: [...]},
+                              "spans": [필드, ...]}
+  - write.lock             : 프로세스 간 쓰기 잠금
+
+메타데이터 값이 문서 안에 그대로 들어 있으면(질의회신의 question/answer 등) 값 대신
+문서 안 위치 [시작, 길이]만 저장하고, 그런 필드를 "spans"에 적는다. 읽을 때 되살린다.
+
+쓰기는 새 세대 디렉터리에 배열을 모두 쓴 뒤 meta.json 하나를 os.replace로 바꿔
+세대를 넘긴다. 읽는 쪽은 meta.json이 가리키는 세대만 열므로 서로 다른 쓰기의
+배열/메타데이터가 섞여 보이지 않는다. 이전 세대는 교체 직후 지운다.
+쓰기는 write.lock 파일 잠금 안에서 하며, 다른 프로세스가 그 사이 세대를 넘겼으면
+먼저 다시 읽고 그 위에 변경을 반영한다 (오래된 데이터로 덮어쓰지 않는다).
+
+한계: 쓰기(add/upsert/delete)는 매번 인덱스 전체를 새 세대로 다시 쓴다 (메타데이터만
+바꾸는 update는 meta.json만 바꾼다). 여러 변경은 apply()로 묶어 한 번에 쓴다. 수만 건
+이상을 조금씩 나눠 기록하면 총 비용이 건수의 제곱에 비례하므로, 대량 적재는 chroma
+백엔드로 한 뒤 rebuild(vector_store.build_numpy_index)로 옮긴다.
+
+vector_store가 chroma 컬렉션과 같은 메서드(count/get/query/add/upsert/update/delete)로 쓴다.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+DTYPES = ("float32", "int8")
+
+# int8 역양자화 시 한 번에 float32로 올리는 행 수 (임시 메모리 상한)
+_CHUNK_ROWS = 32768
+# 이보다 짧은 문자열은 문서 위치로 바꿔 저장해도 줄지 않는다
+_SPAN_MIN_CHARS = 16
+
+
+class NumpyCollection:
+    """메모리 매핑 임베딩 + 열 단위 메타데이터. chroma Collection의 부분 집합 API."""
+
+    def __init__(self, directory: Path, embedding_function, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"지원하지 않는 벡터 dtype: {dtype} ({', '.join(DTYPES)})")
+        self.directory = Path(directory)
+        self.embedding_function = embedding_function
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._load()
+
+    # ── 읽기 ──
+
+    def _load(self):
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.embeddings = None
+        self.scales = None
+        self.generation = 0
+        self._meta_stat = None
+        # meta.json을 읽은 직후 다른 프로세스가 세대를 넘기고 이전 세대를 지웠으면 다시 읽는다
+        for _ in range(3):
+            try:
+                self._load_generation()
+                return
+            except FileNotFoundError:
+                continue
+        self._load_generation()
+
+    def _load_generation(self):
+        meta_path = self.directory / "meta.json"
+        if not meta_path.exists():
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta_stat = _stat_key(os.fstat(f.fileno()))
+            meta = json.load(f)
+        columns = meta["columns"]
+        ids = columns.pop("ids")
+        documents = columns.pop("documents")
+        for key in meta.get("spans", []):
+            columns[key] = [documents[i][v[0]:v[0] + v[1]] if isinstance(v, list) else v for i, v in enumerate(columns[key])]
+        # 세대 기록이 없으면 배열이 디렉터리 바로 아래 있던 이전 형식
+        generation = meta.get("generation", 0)
+        folder = self.directory / f"gen-{generation}" if generation else self.directory
+        embeddings = scales = None
+        if ids:
+            embeddings = np.load(folder / "embeddings.npy", mmap_mode="r")
+            if meta["dtype"] == "int8":
+                scales = np.load(folder / "scales.npy", mmap_mode="r")
+            if len(embeddings) != len(ids) or (scales is not None and len(scales) != len(ids)):
+                raise ValueError(f"numpy 인덱스 손상: {folder}의 배열 행 수가 meta.json id 수({len(ids)})와 다릅니다")
+        self.dtype = meta["dtype"]
+        self.generation = generation
+        self._meta_stat = meta_stat
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = [dict(zip(columns, values)) for values in zip(*columns.values())] if columns else [{} for _ in self.ids]
+        self.embeddings, self.scales = embeddings, scales
+
+    def refresh(self) -> tuple:
+        """다른 프로세스가 세대를 넘겼으면 다시 읽는다. 지금 읽은 meta.json의 식별자를 반환한다."""
+        with self._lock:
+            if self._stale():
+                self._load()
+            return self.generation, self._meta_stat
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, ids: list[str] | None = None, include: list[str] | None = None) -> dict:
+        include = include if include is not None else ["documents", "metadatas"]
+        if ids is None:
+            rows = range(len(self.ids))
+        else:
+            position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            rows = [position[doc_id] for doc_id in ids if doc_id in position]
+        result = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[i] for i in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._dense(list(rows)) if self.embeddings is not None else np.empty((0, 0), np.float32)
+        return result
+
+    def query(self, query_texts: list[str] | None = None, n_results: int = 10, query_embeddings=None) -> dict:
+        """코사인 거리 기준 정확한 top-k. 결과 형태는 chroma query와 같다."""
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        out = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+        for q in queries:
+            similarity = self._similarity(q)
+            n = min(n_results, len(similarity))
+            top = np.argpartition(-similarity, n - 1)[:n] if n else np.empty(0, dtype=int)
+            top = top[np.argsort(-similarity[top])]
+            out["ids"].append([self.ids[i] for i in top])
+            out["metadatas"].append([self.metadatas[i] for i in top])
+            out["documents"].append([self.documents[i] for i in top])
+            out["distances"].append([float(1 - similarity[i]) for i in top])
+        return out
+
+    def _similarity(self, q: np.ndarray) -> np.ndarray:
+        if self.embeddings is None:
+            return np.empty(0, dtype=np.float32)
+        if self.dtype == "float32":
+            return self.embeddings @ q
+        similarity = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), _CHUNK_ROWS):
+            end = start + _CHUNK_ROWS
+            similarity[start:end] = (self.embeddings[start:end].astype(np.float32) @ q) * self.scales[start:end]
+        return similarity
+
+    def _dense(self, rows: list[int]) -> np.ndarray:
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= np.asarray(self.scales[rows])[:, None]
+        return vectors
+
+    # ── 쓰기 (전체를 새 세대로 다시 써서 교체) ──
+
+    def add(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings=None):
+        existing = set(self.ids) & set(ids)
+        if existing:
+            raise ValueError(f"이미 있는 id: {sorted(existing)[:5]}")
+        self.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings=None):
+        if embeddings is None:
+            embeddings = self.embedding_function(documents)
+        self.apply(upserts=(ids, documents, metadatas, embeddings))
+
+    def update(self, ids: list[str], metadatas: list[dict]):
+        """임베딩은 그대로 두고 메타데이터만 바꾼다 (배열은 다시 쓰지 않는다)."""
+        self.apply(updates=(ids, metadatas))
+
+    def delete(self, ids: list[str]):
+        self.apply(deletes=ids)
+
+    def apply(self, upserts=None, updates=None, deletes=None):
+        """upsert/메타데이터 갱신/삭제를 한 번에 반영해 새 세대를 한 번만 쓴다.
+
+        Args:
+            upserts: (ids, documents, metadatas, embeddings). embeddings는 필수
+            updates: (ids, metadatas). 없는 id는 무시
+            deletes: 지울 id 목록
+        """
+        with self._lock, _file_lock(self.directory):
+            # 다른 프로세스가 마지막으로 읽은 뒤 세대를 넘겼으면 그 위에 반영한다
+            if self._stale():
+                self._load()
+            position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            all_ids, all_docs, all_meta = list(self.ids), list(self.documents), list(self.metadatas)
+            for doc_id, meta in zip(*(updates or ((), ()))):
+                if doc_id in position:
+                    all_meta[position[doc_id]] = meta
+            drop = set(deletes or ()) & position.keys()
+            if not upserts and not drop:
+                # 메타데이터만 바뀌면 현재 세대의 배열을 그대로 가리키는 meta.json만 바꾼다
+                if updates:
+                    self._write_meta(self.generation, all_ids, all_docs, all_meta, self._dim())
+                    self._load()
+                return
+
+            # 기존 행을 한 번만 펼치고, 새 행과 합쳐 세대를 한 번만 쓴다
+            keep = [i for i in range(len(all_ids)) if all_ids[i] not in drop]
+            vectors = list(self._dense(keep)) if keep else []
+            all_ids, all_docs, all_meta = [all_ids[i] for i in keep], [all_docs[i] for i in keep], [all_meta[i] for i in keep]
+            if upserts:
+                ids, documents, metadatas, embeddings = upserts
+                position = {doc_id: i for i, doc_id in enumerate(all_ids)}
+                for doc_id, doc, meta, vec in zip(ids, documents, metadatas, _normalize(np.asarray(embeddings, dtype=np.float32))):
+                    i = position.get(doc_id)
+                    if i is None:
+                        position[doc_id] = len(all_ids)
+                        all_ids.append(doc_id)
+                        all_docs.append(doc)
+                        all_meta.append(meta)
+                        vectors.append(vec)
+                    else:
+                        all_docs[i], all_meta[i], vectors[i] = doc, meta, vec
+            self._write(all_ids, all_docs, all_meta, np.vstack(vectors) if vectors else None)
+
+    def _dim(self) -> int | None:
+        return None if self.embeddings is None else int(self.embeddings.shape[1])
+
+    def _stale(self) -> bool:
+        """디스크의 meta.json이 마지막으로 읽은 것과 다른지 (os.replace마다 새 파일이다)."""
+        try:
+            current = _stat_key(os.stat(self.directory / "meta.json"))
+        except FileNotFoundError:
+            current = None
+        return current != self._meta_stat
+
+    def rebuild(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings, dtype: str | None = None):
+        """인덱스 전체를 주어진 레코드로 교체한다 (dtype을 바꿔 다시 저장할 때도 쓴다)."""
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"지원하지 않는 벡터 dtype: {dtype} ({', '.join(DTYPES)})")
+        with self._lock, _file_lock(self.directory):
+            self.dtype = dtype or self.dtype
+            vectors = _normalize(np.asarray(embeddings, dtype=np.float32)) if len(ids) else None
+            self._write(list(ids), list(documents), list(metadatas), vectors)
+
+    def _write(self, ids, documents, metadatas, vectors):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 다른 프로세스가 먼저 넘긴 세대와 겹치지 않도록 디스크의 최신 세대 다음 번호를 쓴다
+        generation = max([self.generation, *_generations(self.directory)]) + 1
+        folder = self.directory / f"gen-{generation}"
+        folder.mkdir(exist_ok=True)
+        if vectors is not None:
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                data = np.round(vectors / scales[:, None]).astype(np.int8)
+                np.save(folder / "scales.npy", scales.astype(np.float32))
+            else:
+                data = vectors.astype(np.float32)
+            np.save(folder / "embeddings.npy", data)
+        # meta.json 교체 한 번이 세대 전환이다. 그 전까지 읽는 쪽은 이전 세대를 그대로 본다
+        self._write_meta(generation, ids, documents, metadatas, None if vectors is None else int(vectors.shape[1]))
+        self._load()
+        _remove_stale(self.directory, generation)
+
+    def _write_meta(self, generation, ids, documents, metadatas, dim):
+        fields = list(dict.fromkeys(key for meta in metadatas for key in meta))
+        columns = {"ids": ids, "documents": documents}
+        spans = []
+        for key in fields:
+            values = [meta.get(key) for meta in metadatas]
+            compact = _spans(values, documents)
+            if compact is not None:
+                values = compact
+                spans.append(key)
+            columns[key] = values
+        tmp = self.directory / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "dtype": self.dtype, "dim": dim, "columns": columns, "spans": spans},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self.directory / "meta.json")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _spans(values: list, documents: list[str]) -> list | None:
+    """문서 안에 그대로 있는 긴 문자열 값을 [시작, 길이]로 바꾼 열. 줄어드는 값이 없거나 목록 값이 있으면 None."""
+    out, found = [], False
+    for value, document in zip(values, documents):
+        if isinstance(value, list):
+            return None
+        start = document.find(value) if isinstance(value, str) and len(value) >= _SPAN_MIN_CHARS else -1
+        if start >= 0:
+            out.append([start, len(value)])
+            found = True
+        else:
+            out.append(value)
+    return out if found else None
+
+
+def _stat_key(stat: os.stat_result) -> tuple:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+@contextlib.contextmanager
+def _file_lock(directory: Path):
+    """같은 인덱스 디렉터리에 쓰는 프로세스끼리의 배타 잠금."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "write.lock", "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _generations(directory: Path) -> list[int]:
+    return [int(p.name[4:]) for p in directory.glob("gen-*") if p.name[4:].isdigit()]
+
+
+def _remove_stale(directory: Path, current: int):
+    """현재보다 이전 세대 디렉터리와 이전 형식의 최상위 배열 파일을 지운다.
+
+    이미 mmap으로 연 프로세스는 (POSIX에서) 지워진 파일을 계속 읽을 수 있고,
+    Windows처럼 열린 파일을 못 지우면 다음 쓰기 때 다시 시도한다.
+    """
+    for generation in _generations(directory):
+        if generation < current:
+            shutil.rmtree(directory / f"gen-{generation}", ignore_errors=True)
+    for name in ("embeddings.npy", "scales.npy"):
+        try:
+            (directory / name).unlink()
+        except OSError:
+            pass
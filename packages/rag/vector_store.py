@@ -1,113 +1,447 @@
-"""벡터 스토어 — ChromaDB 기반 회계 질의회신 검색."""
+"""벡터 스토어 — ChromaDB 기반 회계 질의회신 검색.
 
+기본 임베딩은 "전환사채", "K-IFRS 1115" 같은 한국어 회계 용어와 기준서 번호에 약하므로
+같은 문서를 한국어 문자 n-gram BM25로도 색인해 두고, 두 결과를 순위 융합(RRF)한다.
+
+벡터 백엔드는 VECTOR_BACKEND로 고른다. chroma(기본)는 SQLite + HNSW, numpy는
+memmap .npy 파일에 대한 정확한 top-k 검색(packages/rag/numpy_index)이다.
+build_numpy_index()로 기존 chroma 컬렉션을 재임베딩 없이 numpy 인덱스로 옮길 수 있다.
+문서/질의 임베딩은 packages/rag/embedding이 chroma 기본 모델을 직접 돌리므로 numpy
+백엔드는 chromadb를 import하지 않는다.
+
+환경변수:
+  - VECTOR_BACKEND  : chroma(기본) | numpy
+  - VECTOR_DTYPE    : numpy 백엔드 임베딩 저장 형식, float32(기본) | int8
+  - VECTOR_INDEX_DIR: numpy 백엔드 디렉터리 (기본 data/accounting_qa/numpy_index)
+  - RAG_SEARCH_MODE : hybrid(기본) | vector | bm25
+  - RAG_CANDIDATES  : 하이브리드 융합 전 각 검색기에서 가져올 후보 수 (기본 20)
+  - RAG_RRF_K       : RRF 상수 k, 클수록 하위 순위 가중치가 커진다 (기본 60)
+  - RAG_SYNC_BATCH  : 증분 동기화 시 한 번에 임베딩/기록하는 레코드 수 (기본 64)
+"""
+
+import hashlib
 import json
+import os
 import sys
+import threading
+import time
 from pathlib import Path
 
-# Python 3.14+ ChromaDB Pydantic v1 호환 패치
-# chroma_server_nofile 필드의 @validator가 필드 선언보다 먼저 나와
-# PEP 649(deferred annotation evaluation)에서 타입 추론 실패
-if sys.version_info >= (3, 14):
-    try:
-        from chromadb import config as _chroma_cfg
-        _orig_settings = _chroma_cfg.Settings
-        # Settings 클래스를 로드할 때 에러가 나는지 테스트
-        try:
-            _orig_settings()
-        except Exception:
-            # monkey-patch: __annotations__에 누락된 타입을 직접 주입
-            from typing import Optional
-            if not hasattr(_orig_settings, '__annotations__'):
-                _orig_settings.__annotations__ = {}
-            _orig_settings.__annotations__.setdefault('chroma_server_nofile', Optional[int])
-    except Exception:
-        pass
-
-import chromadb
-from chromadb.config import Settings
+from packages.rag.lexical_index import BM25Index
 
 # 경로 설정
 _DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "accounting_qa"
 _SAMPLE_PATH = _DATA_DIR / "sample_qa.json"
 _CHROMA_DIR = _DATA_DIR / "chroma_db"
+_NUMPY_DIR = _DATA_DIR / "numpy_index"
 _COLLECTION_NAME = "accounting_qa"
 
 _client = None
 _collection = None
+_collection_lock = threading.Lock()
+_chromadb_patched = False
 
+# 컬렉션 문서에 대한 BM25 인덱스 (initialize_store 또는 첫 검색 시 생성)
+_lexical = None
+_lexical_lock = threading.Lock()
 
-def _get_collection():
-    """ChromaDB 컬렉션 반환 (싱글턴)."""
-    global _client, _collection
-    if _collection is None:
+SEARCH_MODES = ("hybrid", "vector", "bm25")
+
+# 증분 동기화 상태: 마지막으로 동기화한 원본 파일 서명과 결과
+_sync_lock = threading.Lock()
+_synced_signature = None
+_last_sync = None
+
+
+class _LexicalIndex:
+    """컬렉션 문서 id/메타데이터와 BM25 인덱스."""
+
+    def __init__(self, ids: list[str], documents: list[str], metadatas: list[dict], stamp=None):
+        self.ids = ids
+        # 만들 때 본 저장소 상태 (_storage_stamp). 바뀌면 다른 프로세스가 기록한 것이다
+        self.stamp = stamp
+        self.metadatas = metadatas
+        self.index = BM25Index(documents)
+        # 코퍼스 버전: (id, 레코드 해시) 전체의 해시. 답변 캐시 등 파생 데이터 무효화에 쓴다
+        digest = hashlib.sha256()
+        for doc_id, doc, meta in sorted(zip(ids, documents, metadatas), key=lambda r: r[0]):
+            digest.update(f"{doc_id}\0{meta.get('content_hash') or _hash(doc)}\n".encode("utf-8"))
+        self.version = digest.hexdigest()[:16]
+
+
+def _import_chromadb():
+    """chromadb를 처음 쓸 때 import한다. 앱 시작 시 chromadb 로드와 호환 패치 비용을 피한다."""
+    global _chromadb_patched
+    if not _chromadb_patched:
+        _patch_chromadb_settings()
+        _chromadb_patched = True
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb, Settings
+
+
+def _patch_chromadb_settings():
+    # Python 3.14+ ChromaDB Pydantic v1 호환 패치
+    # chroma_server_nofile 필드의 @validator가 필드 선언보다 먼저 나와
+    # PEP 649(deferred annotation evaluation)에서 타입 추론 실패
+    if sys.version_info >= (3, 14):
         try:
-            _client = chromadb.PersistentClient(path=str(_CHROMA_DIR))
+            from chromadb import config as _chroma_cfg
+            _orig_settings = _chroma_cfg.Settings
+            # Settings 클래스를 로드할 때 에러가 나는지 테스트
+            try:
+                _orig_settings()
+            except Exception:
+                # monkey-patch: __annotations__에 누락된 타입을 직접 주입
+                from typing import Optional
+                if not hasattr(_orig_settings, '__annotations__'):
+                    _orig_settings.__annotations__ = {}
+                _orig_settings.__annotations__.setdefault('chroma_server_nofile', Optional[int])
         except Exception:
-            # Pydantic v2 호환 이슈 우회: Settings를 직접 지정
-            settings = Settings(
-                persist_directory=str(_CHROMA_DIR),
-                anonymized_telemetry=False,
-                is_persistent=True,
-            )
-            _client = chromadb.Client(settings)
-        _collection = _client.get_or_create_collection(
-            name=_COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"},
-        )
+            pass
+
+
+def _get_collection():
+    """검색 컬렉션 반환 (싱글턴). VECTOR_BACKEND에 따라 chroma 또는 numpy 백엔드."""
+    global _collection
+    if _collection is not None:
+        return _collection
+    # 워밍업 스레드와 첫 질문이 동시에 들어와도 클라이언트는 하나만 만든다
+    with _collection_lock:
+        if _collection is None:
+            if os.getenv("VECTOR_BACKEND", "chroma") == "numpy":
+                _collection = _numpy_collection()
+            else:
+                _collection = _chroma_collection()
     return _collection
 
 
+def _chroma_collection():
+    global _client
+    chromadb, Settings = _import_chromadb()
+    try:
+        _client = chromadb.PersistentClient(path=str(_CHROMA_DIR))
+    except Exception:
+        # Pydantic v2 호환 이슈 우회: Settings를 직접 지정
+        settings = Settings(
+            persist_directory=str(_CHROMA_DIR),
+            anonymized_telemetry=False,
+            is_persistent=True,
+        )
+        _client = chromadb.Client(settings)
+    return _client.get_or_create_collection(
+        name=_COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine"},
+    )
+
+
+def _numpy_collection():
+    from packages.rag.numpy_index import NumpyCollection
+    return NumpyCollection(
+        Path(os.getenv("VECTOR_INDEX_DIR", str(_NUMPY_DIR))),
+        embedding_function=_embed,
+        dtype=os.getenv("VECTOR_DTYPE", "float32"),
+    )
+
+
+def _embed(texts: list[str]):
+    """chroma 기본 임베딩과 같은 MiniLM ONNX 모델로 임베딩한다 (chromadb는 import하지 않는다)."""
+    from packages.rag.embedding import get_embedder
+    return get_embedder()(texts)
+
+
+def build_numpy_index(dtype: str | None = None) -> int:
+    """chroma 컬렉션의 문서/메타데이터/임베딩을 numpy 백엔드 파일로 옮긴다. 옮긴 건수를 반환한다."""
+    from packages.rag.numpy_index import NumpyCollection
+    global _collection, _lexical
+    data = _chroma_collection().get(include=["documents", "metadatas", "embeddings"])
+    target = _numpy_collection()
+    target.rebuild(data["ids"], data["documents"], data["metadatas"], data["embeddings"],
+                   dtype=dtype or os.getenv("VECTOR_DTYPE", "float32"))
+    # 이 프로세스가 numpy 백엔드를 쓰고 있었다면 새 파일로 다시 연다
+    with _collection_lock:
+        if isinstance(_collection, NumpyCollection):
+            _collection = None
+    with _lexical_lock:
+        _lexical = None
+    return len(data["ids"])
+
+
+def warm_up() -> float:
+    """컬렉션(HNSW 인덱스)과 기본 임베딩 모델을 미리 로드한다. 걸린 시간(초)을 반환한다.
+
+    더미 질의 한 번으로 chromadb import, 컬렉션 열기, ONNX 임베딩 모델 로드를 끝내므로
+    첫 사용자 질문이 이 비용을 치르지 않는다.
+    """
+    start = time.perf_counter()
+    search("워밍업", top_k=1)
+    return time.perf_counter() - start
+
+
+def _document(item: dict) -> str:
+    """검색용 문서: 질문 + 답변을 합쳐서 임베딩/색인한다."""
+    return f"[{item['category']}] {item['question']}\n{item['answer']}"
+
+
+def _metadata(item: dict, origin: str) -> dict:
+    return {
+        "category": item["category"],
+        "question": item["question"],
+        "answer": item["answer"],
+        "source": item["source"],
+        "date": item["date"],
+        "origin": origin,
+        "content_hash": _hash(json.dumps(item, ensure_ascii=False, sort_keys=True)),
+    }
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def initialize_store():
-    """샘플 JSON 데이터를 ChromaDB에 로드. 이미 데이터가 있으면 스킵."""
+    """샘플 JSON을 컬렉션에 증분 동기화하고 BM25 인덱스를 만든다. 컬렉션 문서 수를 반환한다.
+
+    원본 파일이 이 프로세스에서 마지막으로 동기화한 뒤 바뀌지 않았으면 동기화는 건너뛴다.
+    """
     collection = _get_collection()
+    stat = _SAMPLE_PATH.stat()
+    signature = (str(_SAMPLE_PATH), stat.st_mtime_ns, stat.st_size)
+    if signature != _synced_signature:
+        sync_store()
+    elif _lexical is None:
+        _build_lexical(collection)
+    return collection.count()
+
+
+def sync_store(path: Path = _SAMPLE_PATH, batch_size: int | None = None) -> dict:
+    """JSON 질의회신 파일을 컬렉션에 증분 반영한다.
+
+    레코드마다 내용 해시를 메타데이터(content_hash)에 저장해 두고, 새 id와 해시가 바뀐
+    id만 batch_size 단위로 upsert(문서가 같으면 임베딩 없이 메타데이터만 갱신)하며,
+    파일에서 빠진 id는 삭제한다. 다른 원본(origin)에서 들어온 레코드는 건드리지 않는다.
+    numpy 백엔드는 임베딩만 배치로 하고, 변경 전체를 apply() 한 번으로 기록한다.
+
+    Returns:
+        {"added", "updated", "metadata_only", "deleted", "unchanged", "count",
+         "embed_seconds", "seconds", "version"}
+    """
+    global _synced_signature, _last_sync
+    batch_size = batch_size or int(os.getenv("RAG_SYNC_BATCH", "64"))
+    start = time.perf_counter()
+    origin = path.name
+    with _sync_lock:
+        stat = path.stat()
+        with open(path, "r", encoding="utf-8") as f:
+            qa_data = json.load(f)
+        records = {item["id"]: item for item in qa_data}
+
+        collection = _get_collection()
+        existing = collection.get(include=["documents", "metadatas"])
+        stored = {
+            doc_id: (doc, meta)
+            for doc_id, doc, meta in zip(existing["ids"], existing["documents"], existing["metadatas"])
+            # origin이 없는 레코드는 이전 버전이 이 파일에서 로드한 것
+            if (meta or {}).get("origin", origin) == origin
+        }
+
+        upserts, metadata_only = [], []
+        unchanged = 0
+        for doc_id, item in records.items():
+            document, metadata = _document(item), _metadata(item, origin)
+            old = stored.get(doc_id)
+            if old is not None and old[1].get("content_hash") == metadata["content_hash"]:
+                unchanged += 1
+            elif old is not None and old[0] == document:
+                metadata_only.append((doc_id, metadata))
+            else:
+                upserts.append((doc_id, document, metadata))
+        removed = [doc_id for doc_id in stored if doc_id not in records]
+
+        embed_seconds = 0.0
+        from packages.rag.numpy_index import NumpyCollection
+        if isinstance(collection, NumpyCollection):
+            # numpy 인덱스는 쓸 때마다 전체를 다시 쓰므로 임베딩만 배치로 하고 반영은 한 번에
+            embeddings = []
+            for i in range(0, len(upserts), batch_size):
+                batch_start = time.perf_counter()
+                embeddings.extend(collection.embedding_function([r[1] for r in upserts[i:i + batch_size]]))
+                embed_seconds += time.perf_counter() - batch_start
+            collection.apply(
+                upserts=([r[0] for r in upserts], [r[1] for r in upserts], [r[2] for r in upserts], embeddings) if upserts else None,
+                updates=([r[0] for r in metadata_only], [r[1] for r in metadata_only]) if metadata_only else None,
+                deletes=removed,
+            )
+        else:
+            for i in range(0, len(upserts), batch_size):
+                batch = upserts[i:i + batch_size]
+                batch_start = time.perf_counter()
+                collection.upsert(
+                    ids=[r[0] for r in batch],
+                    documents=[r[1] for r in batch],
+                    metadatas=[r[2] for r in batch],
+                )
+                embed_seconds += time.perf_counter() - batch_start
+            for i in range(0, len(metadata_only), batch_size):
+                batch = metadata_only[i:i + batch_size]
+                collection.update(ids=[r[0] for r in batch], metadatas=[r[1] for r in batch])
+            for i in range(0, len(removed), batch_size):
+                collection.delete(ids=removed[i:i + batch_size])
+
+        lexical = _build_lexical(collection)
+        if path == _SAMPLE_PATH:
+            _synced_signature = (str(path), stat.st_mtime_ns, stat.st_size)
+        _last_sync = {
+            "added": sum(1 for r in upserts if r[0] not in stored),
+            "updated": sum(1 for r in upserts if r[0] in stored),
+            "metadata_only": len(metadata_only),
+            "deleted": len(removed),
+            "unchanged": unchanged,
+            "count": collection.count(),
+            "embed_seconds": embed_seconds,
+            "seconds": time.perf_counter() - start,
+            "version": lexical.version,
+        }
+        return _last_sync
+
+
+def last_sync() -> dict | None:
+    """이 프로세스의 마지막 sync_store 결과. 아직 동기화하지 않았으면 None."""
+    return _last_sync
+
 
-    if collection.count() > 0:
-        return collection.count()
+def corpus_version() -> str:
+    """현재 컬렉션 내용의 버전 해시. 레코드가 추가/변경/삭제되면 바뀐다.
 
-    with open(_SAMPLE_PATH, "r", encoding="utf-8") as f:
-        qa_data = json.load(f)
+    다른 프로세스(ingest CLI 등)가 저장소에 기록해도 바뀌도록, 저장소 상태가 달라졌으면
+    BM25 인덱스와 함께 다시 계산한다.
+    """
+    return _get_lexical(_get_collection()).version
 
-    ids = []
-    documents = []
-    metadatas = []
 
-    for item in qa_data:
-        ids.append(item["id"])
-        # 검색용 문서: 질문 + 답변을 합쳐서 임베딩
-        doc = f"[{item['category']}] {item['question']}\n{item['answer']}"
-        documents.append(doc)
-        metadatas.append({
-            "category": item["category"],
-            "question": item["question"],
-            "answer": item["answer"],
-            "source": item["source"],
-            "date": item["date"],
-        })
+def _storage_stamp(collection) -> tuple:
+    """저장된 데이터의 상태 식별자. 어느 프로세스든 기록하면 바뀐다.
 
-    collection.add(ids=ids, documents=documents, metadatas=metadatas)
-    return len(ids)
+    numpy는 meta.json 세대(바뀌었으면 컬렉션을 다시 읽는다), chroma는 SQLite 파일과
+    WAL의 크기/수정 시각 + 문서 수.
+    """
+    from packages.rag.numpy_index import NumpyCollection
+    if isinstance(collection, NumpyCollection):
+        return ("numpy", *collection.refresh())
+    files = []
+    for name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+        try:
+            stat = (_CHROMA_DIR / name).stat()
+            files.append((name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+    return ("chroma", *files, collection.count())
+
+
+def _build_lexical(collection) -> _LexicalIndex:
+    """컬렉션에 저장된 문서로 BM25 인덱스를 (다시) 만든다. 임베딩은 필요 없다."""
+    global _lexical
+    # 읽기 전에 상태를 봐 두어, 읽는 중에 들어온 기록은 다음 조회에서 다시 반영한다
+    stamp = _storage_stamp(collection)
+    data = collection.get(include=["documents", "metadatas"])
+    index = _LexicalIndex(data["ids"], data["documents"], data["metadatas"], stamp)
+    with _lexical_lock:
+        _lexical = index
+    return index
+
+
+def _get_lexical(collection) -> _LexicalIndex:
+    with _lexical_lock:
+        index = _lexical
+    if index is None or index.stamp != _storage_stamp(collection):
+        return _build_lexical(collection)
+    return index
+
+
+def embed_query(query: str):
+    """질의 임베딩 (검색과 같은 모델). search(query_embedding=...)로 넘기면 다시 임베딩하지 않는다."""
+    return _embed([query])[0]
+
+
+def search(query: str, top_k: int = 3, mode: str | None = None, query_embedding=None) -> list[dict]:
+    """쿼리와 유사한 질의회신 검색.
 
+    mode: hybrid(벡터 + BM25 순위 융합), vector, bm25. 없으면 RAG_SEARCH_MODE.
+    query_embedding: embed_query로 미리 구한 질의 임베딩 (없으면 컬렉션이 임베딩).
 
-def search(query: str, top_k: int = 3) -> list[dict]:
-    """쿼리와 유사한 질의회신 검색. 결과: [{"id", "category", "question", "answer", "source", "date", "distance"}]"""
+    Returns:
+        [{"id", "category", "question", "answer", "source", "date", "distance", "score"}]
+        distance는 벡터 검색 결과에만 있고(없으면 None), score는 RRF 점수(bm25 모드는 BM25 점수).
+    """
+    mode = mode or os.getenv("RAG_SEARCH_MODE", "hybrid")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"지원하지 않는 검색 모드: {mode} ({', '.join(SEARCH_MODES)})")
     collection = _get_collection()
 
     if collection.count() == 0:
         initialize_store()
+    count = collection.count()
+    if count == 0:
+        return []
+
+    if mode == "vector":
+        # 다른 프로세스가 numpy 인덱스에 기록했으면 다시 읽는다 (다른 모드는 _get_lexical이 확인)
+        _storage_stamp(collection)
+        return _vector_search(collection, query, min(top_k, count), query_embedding)
+    if mode == "bm25":
+        return _lexical_search(collection, query, top_k)
+
+    candidates = min(count, max(top_k, int(os.getenv("RAG_CANDIDATES", "20"))))
+    return _fuse(
+        [
+            _vector_search(collection, query, candidates, query_embedding),
+            _lexical_search(collection, query, candidates),
+        ],
+        top_k,
+    )
+
+
+def _item(doc_id: str, meta: dict, distance: float | None = None, score: float | None = None) -> dict:
+    return {
+        "id": doc_id,
+        "category": meta["category"],
+        "question": meta["question"],
+        "answer": meta["answer"],
+        "source": meta["source"],
+        "date": meta["date"],
+        "distance": distance,
+        "score": score,
+    }
+
+
+def _vector_search(collection, query: str, n: int, query_embedding=None) -> list[dict]:
+    if query_embedding is not None:
+        results = collection.query(query_embeddings=[query_embedding], n_results=n)
+    else:
+        results = collection.query(query_texts=[query], n_results=n)
+    distances = results["distances"][0] if results.get("distances") else None
+    return [
+        _item(doc_id, meta, distances[i] if distances else None)
+        for i, (doc_id, meta) in enumerate(zip(results["ids"][0], results["metadatas"][0]))
+    ]
+
+
+def _lexical_search(collection, query: str, n: int) -> list[dict]:
+    lexical = _get_lexical(collection)
+    return [
+        _item(lexical.ids[idx], lexical.metadatas[idx], score=score)
+        for idx, score in lexical.index.search(query, n)
+    ]
+
 
-    results = collection.query(query_texts=[query], n_results=min(top_k, collection.count()))
-
-    items = []
-    for i in range(len(results["ids"][0])):
-        meta = results["metadatas"][0][i]
-        items.append({
-            "id": results["ids"][0][i],
-            "category": meta["category"],
-            "question": meta["question"],
-            "answer": meta["answer"],
-            "source": meta["source"],
-            "date": meta["date"],
-            "distance": results["distances"][0][i] if results.get("distances") else None,
-        })
-
-    return items
+def _fuse(rankings: list[list[dict]], top_k: int) -> list[dict]:
+    """Reciprocal Rank Fusion: 각 순위 목록에서 1 / (k + 순위)를 더해 다시 정렬한다."""
+    k = int(os.getenv("RAG_RRF_K", "60"))
+    fused = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            entry = fused.setdefault(item["id"], dict(item, score=0.0))
+            if entry["distance"] is None:
+                entry["distance"] = item["distance"]
+            entry["score"] += 1 / (k + rank)
+    return sorted(fused.values(), key=lambda item: item["score"], reverse=True)[:top_k]
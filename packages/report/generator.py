@@ -5,8 +5,6 @@ import re
 from datetime import datetime
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
-
 TEMPLATE_DIR = Path(__file__).parent / "templates"
 OUTPUT_DIR = Path(__file__).resolve().parent.parent.parent / "outputs"
 
@@ -83,6 +81,8 @@ def generate_markdown(context: dict, orchestrator_result: dict, mode: str) -> st
 
 def generate_html(context: dict, orchestrator_result: dict, mode: str) -> str:
     """Jinja2 템플릿으로 HTML 보고서를 렌더링한다."""
+    from jinja2 import Environment, FileSystemLoader
+
     env = Environment(loader=FileSystemLoader(str(TEMPLATE_DIR)), autoescape=False)
     template = env.get_template("report.html.j2")
 